@@ -5,10 +5,62 @@ d = { 'settings': { 'branch': 'main',
                 'doc_host': 'https://AIR-UFG.github.io',
                 'git_url': 'https://github.com/AIR-UFG/pillarnext_explained',
                 'lib_path': 'pillarnext_explained'},
-  'syms': { 'pillarnext_explained.datasets.build_loader': { 'pillarnext_explained.datasets.build_loader.build_dataloader': ( 'build_loader.html#build_dataloader',
+  'syms': { 'pillarnext_explained.benchmark': { 'pillarnext_explained.benchmark._AllocationTracker': ( 'benchmark.html#_allocationtracker',
+                                                                                                       'pillarnext_explained/benchmark.py'),
+                                                'pillarnext_explained.benchmark._AllocationTracker.__init__': ( 'benchmark.html#_allocationtracker.__init__',
+                                                                                                                'pillarnext_explained/benchmark.py'),
+                                                'pillarnext_explained.benchmark._AllocationTracker.__torch_dispatch__': ( 'benchmark.html#_allocationtracker.__torch_dispatch__',
+                                                                                                                          'pillarnext_explained/benchmark.py'),
+                                                'pillarnext_explained.benchmark._AllocationTracker._release': ( 'benchmark.html#_allocationtracker._release',
+                                                                                                                'pillarnext_explained/benchmark.py'),
+                                                'pillarnext_explained.benchmark._build': ( 'benchmark.html#_build',
+                                                                                           'pillarnext_explained/benchmark.py'),
+                                                'pillarnext_explained.benchmark._peak_allocated_mb': ( 'benchmark.html#_peak_allocated_mb',
+                                                                                                       'pillarnext_explained/benchmark.py'),
+                                                'pillarnext_explained.benchmark.benchmark_cli': ( 'benchmark.html#benchmark_cli',
+                                                                                                  'pillarnext_explained/benchmark.py'),
+                                                'pillarnext_explained.benchmark.compare_to_baseline': ( 'benchmark.html#compare_to_baseline',
+                                                                                                        'pillarnext_explained/benchmark.py'),
+                                                'pillarnext_explained.benchmark.measure_latency': ( 'benchmark.html#measure_latency',
+                                                                                                    'pillarnext_explained/benchmark.py'),
+                                                'pillarnext_explained.benchmark.run_benchmark': ( 'benchmark.html#run_benchmark',
+                                                                                                  'pillarnext_explained/benchmark.py'),
+                                                'pillarnext_explained.benchmark.synthetic_cloud': ( 'benchmark.html#synthetic_cloud',
+                                                                                                    'pillarnext_explained/benchmark.py')},
+            'pillarnext_explained.datasets.build_loader': { 'pillarnext_explained.datasets.build_loader.LocalitySampler': ( 'build_loader.html#localitysampler',
+                                                                                                                            'pillarnext_explained/datasets/build_loader.py'),
+                                                            'pillarnext_explained.datasets.build_loader.LocalitySampler.__init__': ( 'build_loader.html#localitysampler.__init__',
+                                                                                                                                     'pillarnext_explained/datasets/build_loader.py'),
+                                                            'pillarnext_explained.datasets.build_loader.LocalitySampler.__iter__': ( 'build_loader.html#localitysampler.__iter__',
+                                                                                                                                     'pillarnext_explained/datasets/build_loader.py'),
+                                                            'pillarnext_explained.datasets.build_loader.LocalitySampler.__len__': ( 'build_loader.html#localitysampler.__len__',
+                                                                                                                                    'pillarnext_explained/datasets/build_loader.py'),
+                                                            'pillarnext_explained.datasets.build_loader.LocalitySampler._partition': ( 'build_loader.html#localitysampler._partition',
+                                                                                                                                       'pillarnext_explained/datasets/build_loader.py'),
+                                                            'pillarnext_explained.datasets.build_loader.LocalitySampler.set_epoch': ( 'build_loader.html#localitysampler.set_epoch',
+                                                                                                                                      'pillarnext_explained/datasets/build_loader.py'),
+                                                            'pillarnext_explained.datasets.build_loader.PrefetchLoader': ( 'build_loader.html#prefetchloader',
+                                                                                                                           'pillarnext_explained/datasets/build_loader.py'),
+                                                            'pillarnext_explained.datasets.build_loader.PrefetchLoader.__init__': ( 'build_loader.html#prefetchloader.__init__',
+                                                                                                                                    'pillarnext_explained/datasets/build_loader.py'),
+                                                            'pillarnext_explained.datasets.build_loader.PrefetchLoader.__iter__': ( 'build_loader.html#prefetchloader.__iter__',
+                                                                                                                                    'pillarnext_explained/datasets/build_loader.py'),
+                                                            'pillarnext_explained.datasets.build_loader.PrefetchLoader.__len__': ( 'build_loader.html#prefetchloader.__len__',
+                                                                                                                                   'pillarnext_explained/datasets/build_loader.py'),
+                                                            'pillarnext_explained.datasets.build_loader.PrefetchLoader._produce': ( 'build_loader.html#prefetchloader._produce',
+                                                                                                                                    'pillarnext_explained/datasets/build_loader.py'),
+                                                            'pillarnext_explained.datasets.build_loader.PrefetchLoader.wait_summary': ( 'build_loader.html#prefetchloader.wait_summary',
+                                                                                                                                        'pillarnext_explained/datasets/build_loader.py'),
+                                                            'pillarnext_explained.datasets.build_loader._tensors': ( 'build_loader.html#_tensors',
+                                                                                                                     'pillarnext_explained/datasets/build_loader.py'),
+                                                            'pillarnext_explained.datasets.build_loader._to_device': ( 'build_loader.html#_to_device',
+                                                                                                                       'pillarnext_explained/datasets/build_loader.py'),
+                                                            'pillarnext_explained.datasets.build_loader.build_dataloader': ( 'build_loader.html#build_dataloader',
                                                                                                                              'pillarnext_explained/datasets/build_loader.py'),
                                                             'pillarnext_explained.datasets.build_loader.collate': ( 'build_loader.html#collate',
-                                                                                                                    'pillarnext_explained/datasets/build_loader.py')},
+                                                                                                                    'pillarnext_explained/datasets/build_loader.py'),
+                                                            'pillarnext_explained.datasets.build_loader.worker_init': ( 'build_loader.html#worker_init',
+                                                                                                                        'pillarnext_explained/datasets/build_loader.py')},
             'pillarnext_explained.datasets.dataset': { 'pillarnext_explained.datasets.dataset.BaseDataset': ( 'dataset.html#basedataset',
                                                                                                               'pillarnext_explained/datasets/dataset.py'),
                                                        'pillarnext_explained.datasets.dataset.BaseDataset.__getitem__': ( 'dataset.html#basedataset.__getitem__',
@@ -21,18 +73,62 @@ d = { 'settings': { 'branch': 'main',
                                                                                                                          'pillarnext_explained/datasets/dataset.py'),
                                                        'pillarnext_explained.datasets.dataset.BaseDataset.format_eval': ( 'dataset.html#basedataset.format_eval',
                                                                                                                           'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.BaseDataset.get_sample': ( 'dataset.html#basedataset.get_sample',
+                                                                                                                         'pillarnext_explained/datasets/dataset.py'),
                                                        'pillarnext_explained.datasets.dataset.BaseDataset.load_box3d': ( 'dataset.html#basedataset.load_box3d',
                                                                                                                          'pillarnext_explained/datasets/dataset.py'),
                                                        'pillarnext_explained.datasets.dataset.BaseDataset.load_infos': ( 'dataset.html#basedataset.load_infos',
                                                                                                                          'pillarnext_explained/datasets/dataset.py'),
                                                        'pillarnext_explained.datasets.dataset.BaseDataset.load_pointcloud': ( 'dataset.html#basedataset.load_pointcloud',
                                                                                                                               'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.BaseDataset.worker_init': ( 'dataset.html#basedataset.worker_init',
+                                                                                                                          'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.BatchAffineAugmentation': ( 'dataset.html#batchaffineaugmentation',
+                                                                                                                          'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.BatchAffineAugmentation.__call__': ( 'dataset.html#batchaffineaugmentation.__call__',
+                                                                                                                                   'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.BatchAffineAugmentation.keep_boxes': ( 'dataset.html#batchaffineaugmentation.keep_boxes',
+                                                                                                                                     'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.BatchAffineAugmentation.sample_batch': ( 'dataset.html#batchaffineaugmentation.sample_batch',
+                                                                                                                                       'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.BatchAffineAugmentation.transform_box_tensor': ( 'dataset.html#batchaffineaugmentation.transform_box_tensor',
+                                                                                                                                               'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.BatchAffineAugmentation.transform_points': ( 'dataset.html#batchaffineaugmentation.transform_points',
+                                                                                                                                           'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.GTDatabaseSampler': ( 'dataset.html#gtdatabasesampler',
+                                                                                                                    'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.GTDatabaseSampler.__getstate__': ( 'dataset.html#gtdatabasesampler.__getstate__',
+                                                                                                                                 'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.GTDatabaseSampler.__init__': ( 'dataset.html#gtdatabasesampler.__init__',
+                                                                                                                             'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.GTDatabaseSampler.points': ( 'dataset.html#gtdatabasesampler.points',
+                                                                                                                           'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.GTDatabaseSampler.sample_all': ( 'dataset.html#gtdatabasesampler.sample_all',
+                                                                                                                               'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.GTDatabaseSampler.worker_init': ( 'dataset.html#gtdatabasesampler.worker_init',
+                                                                                                                                'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.GlobalAffineAugmentation': ( 'dataset.html#globalaffineaugmentation',
+                                                                                                                           'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.GlobalAffineAugmentation.__call__': ( 'dataset.html#globalaffineaugmentation.__call__',
+                                                                                                                                    'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.GlobalAffineAugmentation.__init__': ( 'dataset.html#globalaffineaugmentation.__init__',
+                                                                                                                                    'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.GlobalAffineAugmentation.sample': ( 'dataset.html#globalaffineaugmentation.sample',
+                                                                                                                                  'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.GlobalAffineAugmentation.transform_boxes': ( 'dataset.html#globalaffineaugmentation.transform_boxes',
+                                                                                                                                           'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.GlobalAffineAugmentation.worker_init': ( 'dataset.html#globalaffineaugmentation.worker_init',
+                                                                                                                                       'pillarnext_explained/datasets/dataset.py'),
                                                        'pillarnext_explained.datasets.dataset.NuScenesDataset': ( 'dataset.html#nuscenesdataset',
                                                                                                                   'pillarnext_explained/datasets/dataset.py'),
                                                        'pillarnext_explained.datasets.dataset.NuScenesDataset.__init__': ( 'dataset.html#nuscenesdataset.__init__',
                                                                                                                            'pillarnext_explained/datasets/dataset.py'),
                                                        'pillarnext_explained.datasets.dataset.NuScenesDataset.cbgs': ( 'dataset.html#nuscenesdataset.cbgs',
                                                                                                                        'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.NuScenesDataset.create_gt_database': ( 'dataset.html#nuscenesdataset.create_gt_database',
+                                                                                                                                     'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.NuScenesDataset.crop_points': ( 'dataset.html#nuscenesdataset.crop_points',
+                                                                                                                              'pillarnext_explained/datasets/dataset.py'),
                                                        'pillarnext_explained.datasets.dataset.NuScenesDataset.evaluation': ( 'dataset.html#nuscenesdataset.evaluation',
                                                                                                                              'pillarnext_explained/datasets/dataset.py'),
                                                        'pillarnext_explained.datasets.dataset.NuScenesDataset.load_pointcloud': ( 'dataset.html#nuscenesdataset.load_pointcloud',
@@ -41,22 +137,92 @@ d = { 'settings': { 'branch': 'main',
                                                                                                                             'pillarnext_explained/datasets/dataset.py'),
                                                        'pillarnext_explained.datasets.dataset.NuScenesDataset.read_sweep': ( 'dataset.html#nuscenesdataset.read_sweep',
                                                                                                                              'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.NuScenesDataset.read_sweep_file': ( 'dataset.html#nuscenesdataset.read_sweep_file',
+                                                                                                                                  'pillarnext_explained/datasets/dataset.py'),
                                                        'pillarnext_explained.datasets.dataset.NuScenesDataset.remove_close': ( 'dataset.html#nuscenesdataset.remove_close',
                                                                                                                                'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.NuScenesDataset.worker_init': ( 'dataset.html#nuscenesdataset.worker_init',
+                                                                                                                              'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.SweepBuffer': ( 'dataset.html#sweepbuffer',
+                                                                                                              'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.SweepBuffer.__init__': ( 'dataset.html#sweepbuffer.__init__',
+                                                                                                                       'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.SweepBuffer.__len__': ( 'dataset.html#sweepbuffer.__len__',
+                                                                                                                      'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.SweepBuffer._reserve': ( 'dataset.html#sweepbuffer._reserve',
+                                                                                                                       'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.SweepBuffer.points': ( 'dataset.html#sweepbuffer.points',
+                                                                                                                     'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.SweepBuffer.push': ( 'dataset.html#sweepbuffer.push',
+                                                                                                                   'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.SweepBuffer.reader_input': ( 'dataset.html#sweepbuffer.reader_input',
+                                                                                                                           'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.SweepBuffer.reset': ( 'dataset.html#sweepbuffer.reset',
+                                                                                                                    'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.SweepDecimation': ( 'dataset.html#sweepdecimation',
+                                                                                                                  'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.SweepDecimation.__call__': ( 'dataset.html#sweepdecimation.__call__',
+                                                                                                                           'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.SweepDecimation.__init__': ( 'dataset.html#sweepdecimation.__init__',
+                                                                                                                           'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.SweepDecimation.voxel_sizes': ( 'dataset.html#sweepdecimation.voxel_sizes',
+                                                                                                                              'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset._box_collisions': ( 'dataset.html#_box_collisions',
+                                                                                                                  'pillarnext_explained/datasets/dataset.py'),
                                                        'pillarnext_explained.datasets.dataset._lidar_nusc_box_to_global': ( 'dataset.html#_lidar_nusc_box_to_global',
                                                                                                                             'pillarnext_explained/datasets/dataset.py'),
                                                        'pillarnext_explained.datasets.dataset._second_det_to_nusc_box': ( 'dataset.html#_second_det_to_nusc_box',
                                                                                                                           'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.affine_points_jit': ( 'dataset.html#affine_points_jit',
+                                                                                                                    'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.compile_kernels': ( 'dataset.html#compile_kernels',
+                                                                                                                  'pillarnext_explained/datasets/dataset.py'),
                                                        'pillarnext_explained.datasets.dataset.eval_main': ( 'dataset.html#eval_main',
                                                                                                             'pillarnext_explained/datasets/dataset.py'),
                                                        'pillarnext_explained.datasets.dataset.points_in_boxes_jit': ( 'dataset.html#points_in_boxes_jit',
                                                                                                                       'pillarnext_explained/datasets/dataset.py'),
                                                        'pillarnext_explained.datasets.dataset.points_in_rbbox': ( 'dataset.html#points_in_rbbox',
-                                                                                                                  'pillarnext_explained/datasets/dataset.py')},
+                                                                                                                  'pillarnext_explained/datasets/dataset.py'),
+                                                       'pillarnext_explained.datasets.dataset.voxel_keys_jit': ( 'dataset.html#voxel_keys_jit',
+                                                                                                                 'pillarnext_explained/datasets/dataset.py')},
+            'pillarnext_explained.datasets.point_format': { 'pillarnext_explained.datasets.point_format.convert_point_files': ( 'point_format.html#convert_point_files',
+                                                                                                                                'pillarnext_explained/datasets/point_format.py'),
+                                                            'pillarnext_explained.datasets.point_format.convert_points_cli': ( 'point_format.html#convert_points_cli',
+                                                                                                                               'pillarnext_explained/datasets/point_format.py'),
+                                                            'pillarnext_explained.datasets.point_format.dequantize_points': ( 'point_format.html#dequantize_points',
+                                                                                                                              'pillarnext_explained/datasets/point_format.py'),
+                                                            'pillarnext_explained.datasets.point_format.quantize_points': ( 'point_format.html#quantize_points',
+                                                                                                                            'pillarnext_explained/datasets/point_format.py'),
+                                                            'pillarnext_explained.datasets.point_format.read_quantized': ( 'point_format.html#read_quantized',
+                                                                                                                           'pillarnext_explained/datasets/point_format.py'),
+                                                            'pillarnext_explained.datasets.point_format.write_quantized': ( 'point_format.html#write_quantized',
+                                                                                                                            'pillarnext_explained/datasets/point_format.py')},
+            'pillarnext_explained.datasets.shards': { 'pillarnext_explained.datasets.shards.ShardDataset': ( 'shards.html#sharddataset',
+                                                                                                             'pillarnext_explained/datasets/shards.py'),
+                                                      'pillarnext_explained.datasets.shards.ShardDataset.__init__': ( 'shards.html#sharddataset.__init__',
+                                                                                                                      'pillarnext_explained/datasets/shards.py'),
+                                                      'pillarnext_explained.datasets.shards.ShardDataset.__iter__': ( 'shards.html#sharddataset.__iter__',
+                                                                                                                      'pillarnext_explained/datasets/shards.py'),
+                                                      'pillarnext_explained.datasets.shards.ShardDataset.__len__': ( 'shards.html#sharddataset.__len__',
+                                                                                                                     'pillarnext_explained/datasets/shards.py'),
+                                                      'pillarnext_explained.datasets.shards.ShardDataset._info': ( 'shards.html#sharddataset._info',
+                                                                                                                   'pillarnext_explained/datasets/shards.py'),
+                                                      'pillarnext_explained.datasets.shards.ShardDataset._records': ( 'shards.html#sharddataset._records',
+                                                                                                                      'pillarnext_explained/datasets/shards.py'),
+                                                      'pillarnext_explained.datasets.shards.ShardDataset._segments': ( 'shards.html#sharddataset._segments',
+                                                                                                                       'pillarnext_explained/datasets/shards.py'),
+                                                      'pillarnext_explained.datasets.shards.ShardDataset.set_epoch': ( 'shards.html#sharddataset.set_epoch',
+                                                                                                                       'pillarnext_explained/datasets/shards.py'),
+                                                      'pillarnext_explained.datasets.shards.ShardDataset.worker_init': ( 'shards.html#sharddataset.worker_init',
+                                                                                                                         'pillarnext_explained/datasets/shards.py'),
+                                                      'pillarnext_explained.datasets.shards.export_shards': ( 'shards.html#export_shards',
+                                                                                                              'pillarnext_explained/datasets/shards.py')},
             'pillarnext_explained.models.model_backbones': { 'pillarnext_explained.models.model_backbones.SparseResNet': ( 'model_backbones.html#sparseresnet',
                                                                                                                            'pillarnext_explained/models/model_backbones.py'),
                                                              'pillarnext_explained.models.model_backbones.SparseResNet.__init__': ( 'model_backbones.html#sparseresnet.__init__',
                                                                                                                                     'pillarnext_explained/models/model_backbones.py'),
+                                                             'pillarnext_explained.models.model_backbones.SparseResNet._forward': ( 'model_backbones.html#sparseresnet._forward',
+                                                                                                                                    'pillarnext_explained/models/model_backbones.py'),
                                                              'pillarnext_explained.models.model_backbones.SparseResNet._make_layer': ( 'model_backbones.html#sparseresnet._make_layer',
                                                                                                                                        'pillarnext_explained/models/model_backbones.py'),
                                                              'pillarnext_explained.models.model_backbones.SparseResNet.forward': ( 'model_backbones.html#sparseresnet.forward',
@@ -65,6 +231,8 @@ d = { 'settings': { 'branch': 'main',
                                                                                                                              'pillarnext_explained/models/model_backbones.py'),
                                                              'pillarnext_explained.models.model_backbones.SparseResNet3D.__init__': ( 'model_backbones.html#sparseresnet3d.__init__',
                                                                                                                                       'pillarnext_explained/models/model_backbones.py'),
+                                                             'pillarnext_explained.models.model_backbones.SparseResNet3D._forward': ( 'model_backbones.html#sparseresnet3d._forward',
+                                                                                                                                      'pillarnext_explained/models/model_backbones.py'),
                                                              'pillarnext_explained.models.model_backbones.SparseResNet3D._make_layer': ( 'model_backbones.html#sparseresnet3d._make_layer',
                                                                                                                                          'pillarnext_explained/models/model_backbones.py'),
                                                              'pillarnext_explained.models.model_backbones.SparseResNet3D.forward': ( 'model_backbones.html#sparseresnet3d.forward',
@@ -73,10 +241,34 @@ d = { 'settings': { 'branch': 'main',
                                                                                                                'pillarnext_explained/models/model_necks.py'),
                                                          'pillarnext_explained.models.model_necks.ASPPNeck.__init__': ( 'model_necks.html#asppneck.__init__',
                                                                                                                         'pillarnext_explained/models/model_necks.py'),
+                                                         'pillarnext_explained.models.model_necks.ASPPNeck._branch': ( 'model_necks.html#asppneck._branch',
+                                                                                                                       'pillarnext_explained/models/model_necks.py'),
                                                          'pillarnext_explained.models.model_necks.ASPPNeck._forward': ( 'model_necks.html#asppneck._forward',
                                                                                                                         'pillarnext_explained/models/model_necks.py'),
+                                                         'pillarnext_explained.models.model_necks.ASPPNeck._pyramid': ( 'model_necks.html#asppneck._pyramid',
+                                                                                                                        'pillarnext_explained/models/model_necks.py'),
+                                                         'pillarnext_explained.models.model_necks.ASPPNeck._pyramid_fused': ( 'model_necks.html#asppneck._pyramid_fused',
+                                                                                                                              'pillarnext_explained/models/model_necks.py'),
+                                                         'pillarnext_explained.models.model_necks.ASPPNeck._pyramid_per_branch': ( 'model_necks.html#asppneck._pyramid_per_branch',
+                                                                                                                                   'pillarnext_explained/models/model_necks.py'),
                                                          'pillarnext_explained.models.model_necks.ASPPNeck.forward': ( 'model_necks.html#asppneck.forward',
                                                                                                                        'pillarnext_explained/models/model_necks.py')},
+            'pillarnext_explained.models.model_quantization': { 'pillarnext_explained.models.model_quantization._Bf16Autocast': ( 'model_quantization.html#_bf16autocast',
+                                                                                                                                  'pillarnext_explained/models/model_quantization.py'),
+                                                                'pillarnext_explained.models.model_quantization._Bf16Autocast.__init__': ( 'model_quantization.html#_bf16autocast.__init__',
+                                                                                                                                           'pillarnext_explained/models/model_quantization.py'),
+                                                                'pillarnext_explained.models.model_quantization._Bf16Autocast.forward': ( 'model_quantization.html#_bf16autocast.forward',
+                                                                                                                                          'pillarnext_explained/models/model_quantization.py'),
+                                                                'pillarnext_explained.models.model_quantization._dense_targets': ( 'model_quantization.html#_dense_targets',
+                                                                                                                                   'pillarnext_explained/models/model_quantization.py'),
+                                                                'pillarnext_explained.models.model_quantization._set_submodule': ( 'model_quantization.html#_set_submodule',
+                                                                                                                                   'pillarnext_explained/models/model_quantization.py'),
+                                                                'pillarnext_explained.models.model_quantization._traceable': ( 'model_quantization.html#_traceable',
+                                                                                                                               'pillarnext_explained/models/model_quantization.py'),
+                                                                'pillarnext_explained.models.model_quantization.quantization_report': ( 'model_quantization.html#quantization_report',
+                                                                                                                                        'pillarnext_explained/models/model_quantization.py'),
+                                                                'pillarnext_explained.models.model_quantization.quantize_dense': ( 'model_quantization.html#quantize_dense',
+                                                                                                                                   'pillarnext_explained/models/model_quantization.py')},
             'pillarnext_explained.models.model_readers': { 'pillarnext_explained.models.model_readers.CylinderNet': ( 'model_readers.html#cylindernet',
                                                                                                                       'pillarnext_explained/models/model_readers.py'),
                                                            'pillarnext_explained.models.model_readers.CylinderNet.__init__': ( 'model_readers.html#cylindernet.__init__',
@@ -93,6 +285,8 @@ d = { 'settings': { 'branch': 'main',
                                                                                                                         'pillarnext_explained/models/model_readers.py'),
                                                            'pillarnext_explained.models.model_readers.MVFFeatureNet.__init__': ( 'model_readers.html#mvffeaturenet.__init__',
                                                                                                                                  'pillarnext_explained/models/model_readers.py'),
+                                                           'pillarnext_explained.models.model_readers.MVFFeatureNet._point_features': ( 'model_readers.html#mvffeaturenet._point_features',
+                                                                                                                                        'pillarnext_explained/models/model_readers.py'),
                                                            'pillarnext_explained.models.model_readers.MVFFeatureNet.forward': ( 'model_readers.html#mvffeaturenet.forward',
                                                                                                                                 'pillarnext_explained/models/model_readers.py'),
                                                            'pillarnext_explained.models.model_readers.PFNLayer': ( 'model_readers.html#pfnlayer',
@@ -146,7 +340,17 @@ d = { 'settings': { 'branch': 'main',
                                                            'pillarnext_explained.models.model_readers.VoxelNet.__init__': ( 'model_readers.html#voxelnet.__init__',
                                                                                                                             'pillarnext_explained/models/model_readers.py'),
                                                            'pillarnext_explained.models.model_readers.VoxelNet.forward': ( 'model_readers.html#voxelnet.forward',
-                                                                                                                           'pillarnext_explained/models/model_readers.py')},
+                                                                                                                           'pillarnext_explained/models/model_readers.py'),
+                                                           'pillarnext_explained.models.model_readers._grid_size': ( 'model_readers.html#_grid_size',
+                                                                                                                     'pillarnext_explained/models/model_readers.py'),
+                                                           'pillarnext_explained.models.model_readers._linear_keys': ( 'model_readers.html#_linear_keys',
+                                                                                                                       'pillarnext_explained/models/model_readers.py'),
+                                                           'pillarnext_explained.models.model_readers._scatter_max': ( 'model_readers.html#_scatter_max',
+                                                                                                                       'pillarnext_explained/models/model_readers.py'),
+                                                           'pillarnext_explained.models.model_readers._scatter_mean': ( 'model_readers.html#_scatter_mean',
+                                                                                                                        'pillarnext_explained/models/model_readers.py'),
+                                                           'pillarnext_explained.models.model_readers._unpack_keys': ( 'model_readers.html#_unpack_keys',
+                                                                                                                       'pillarnext_explained/models/model_readers.py')},
             'pillarnext_explained.models.model_utils': { 'pillarnext_explained.models.model_utils.BasicBlock': ( 'model_utils.html#basicblock',
                                                                                                                  'pillarnext_explained/models/model_utils.py'),
                                                          'pillarnext_explained.models.model_utils.BasicBlock.__init__': ( 'model_utils.html#basicblock.__init__',
@@ -189,5 +393,25 @@ d = { 'settings': { 'branch': 'main',
                                                                                                                                'pillarnext_explained/models/model_utils.py'),
                                                          'pillarnext_explained.models.model_utils.SparseConvBlock.forward': ( 'model_utils.html#sparseconvblock.forward',
                                                                                                                               'pillarnext_explained/models/model_utils.py'),
+                                                         'pillarnext_explained.models.model_utils._ChannelShift': ( 'model_utils.html#_channelshift',
+                                                                                                                    'pillarnext_explained/models/model_utils.py'),
+                                                         'pillarnext_explained.models.model_utils._ChannelShift.__init__': ( 'model_utils.html#_channelshift.__init__',
+                                                                                                                             'pillarnext_explained/models/model_utils.py'),
+                                                         'pillarnext_explained.models.model_utils._ChannelShift.forward': ( 'model_utils.html#_channelshift.forward',
+                                                                                                                            'pillarnext_explained/models/model_utils.py'),
+                                                         'pillarnext_explained.models.model_utils._fold_batchnorm': ( 'model_utils.html#_fold_batchnorm',
+                                                                                                                      'pillarnext_explained/models/model_utils.py'),
+                                                         'pillarnext_explained.models.model_utils._set_algo': ( 'model_utils.html#_set_algo',
+                                                                                                                'pillarnext_explained/models/model_utils.py'),
+                                                         'pillarnext_explained.models.model_utils._share_indices': ( 'model_utils.html#_share_indices',
+                                                                                                                     'pillarnext_explained/models/model_utils.py'),
+                                                         'pillarnext_explained.models.model_utils.apply_sparse_algos': ( 'model_utils.html#apply_sparse_algos',
+                                                                                                                         'pillarnext_explained/models/model_utils.py'),
+                                                         'pillarnext_explained.models.model_utils.autotune_sparse_algos': ( 'model_utils.html#autotune_sparse_algos',
+                                                                                                                            'pillarnext_explained/models/model_utils.py'),
+                                                         'pillarnext_explained.models.model_utils.checkpointing_report': ( 'model_utils.html#checkpointing_report',
+                                                                                                                           'pillarnext_explained/models/model_utils.py'),
+                                                         'pillarnext_explained.models.model_utils.fuse_for_inference': ( 'model_utils.html#fuse_for_inference',
+                                                                                                                         'pillarnext_explained/models/model_utils.py'),
                                                          'pillarnext_explained.models.model_utils.replace_feature': ( 'model_utils.html#replace_feature',
                                                                                                                       'pillarnext_explained/models/model_utils.py')}}}
@@ -0,0 +1,226 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/09_benchmark.ipynb.
+
+# %% auto 0
+__all__ = ['PC_RANGE', 'BENCHMARK_CONFIGS', 'synthetic_cloud', 'measure_latency', 'run_benchmark', 'compare_to_baseline',
+           'benchmark_cli']
+
+# %% ../nbs/09_benchmark.ipynb 3
+import json
+import math
+import os
+import platform
+import time
+import weakref
+import numpy as np
+import torch
+from torch.utils._python_dispatch import TorchDispatchMode
+from torch.utils._pytree import tree_leaves
+from fastcore.script import call_parse
+from .models.model_readers import PillarFeatureNet, VoxelFeatureNet, MVFFeatureNet
+from .models.model_backbones import SparseResNet, SparseResNet3D
+from .models.model_necks import ASPPNeck
+
+# %% ../nbs/09_benchmark.ipynb 4
+PC_RANGE = [-54, -54, -5, 54, 54, 3] # nuScenes detection range, x, y, z min then max
+BENCHMARK_CONFIGS = {
+    'PillarFeatureNet': dict(num_input_features=5, num_filters=[32], voxel_size=[0.075, 0.075, 8],
+                             pc_range=PC_RANGE, norm_cfg=None),
+    'VoxelFeatureNet': dict(voxel_size=[0.075, 0.075, 0.2], pc_range=PC_RANGE),
+    'MVFFeatureNet': dict(in_channels=5, voxel_size=[0.3, 0.3, 8], pc_range=PC_RANGE, cylinder_size=[1, 0.2, 0.4],
+                          cylinder_range=[-180, -5, 0, 180, 3, 77], num_filters=[32, 32], layer_nums=[1, 1],
+                          ds_layer_strides=[1, 2], ds_num_filters=[32, 64], kernel_size=[3, 3], out_channels=64),
+    'SparseResNet': dict(layer_nums=[2, 3, 3, 2], ds_layer_strides=[1, 2, 2, 2], ds_num_filters=[32, 64, 128, 256],
+                         num_input_features=32, kernel_size=[3, 3, 3, 3], out_channels=256),
+    'SparseResNet3D': dict(layer_nums=[1, 2, 2, 1], ds_layer_strides=[1, 2, 2, 2], ds_num_filters=[16, 32, 64, 128],
+                           num_input_features=5, kernel_size=[3, 3, 3, 3], out_channels=128),
+    'ASPPNeck': dict(in_channels=256),
+} # Constructor arguments of each benchmarked module, following the nuScenes PillarNeXt setup
+
+# %% ../nbs/09_benchmark.ipynb 5
+def synthetic_cloud(num_points:int, # Number of points per sample
+                    batch_size:int=1, # Number of samples
+                    pc_range:list=PC_RANGE, # Range the points are drawn in
+                    nsweeps:int=10, # Number of sweeps the time lags are spread over
+                    seed:int=0 # Seed of the generator, the same arguments always give the same cloud
+                    ): # Points of shape (batch_size * num_points, 6): batch_id, x, y, z, intensity, time_lag
+    """
+    Draws a LiDAR-like cloud: ranges are half-normal so the density decays away from the ego vehicle as in a
+    spinning sensor, heights cluster around the ground and every point carries an intensity and the time lag
+    of one of `nsweeps` sweeps.
+    """
+    generator = torch.Generator().manual_seed(seed)
+    n = num_points * batch_size
+    max_range = min(pc_range[3], -pc_range[0], pc_range[4], -pc_range[1])
+    rho = (torch.randn(n, generator=generator).abs() * max_range / 2.5).clamp(1, max_range - 1e-3)
+    phi = torch.rand(n, generator=generator) * 2 * math.pi
+    z = (torch.randn(n, generator=generator) * 0.8 - 1).clamp(pc_range[2], pc_range[5] - 1e-3)
+    intensity = torch.rand(n, generator=generator)
+    time_lag = torch.randint(0, nsweeps, (n,), generator=generator).float() * 0.05
+    batch_id = torch.arange(batch_size).repeat_interleave(num_points).float()
+    return torch.stack([batch_id, rho * torch.cos(phi), rho * torch.sin(phi), z, intensity, time_lag], dim=1)
+
+# %% ../nbs/09_benchmark.ipynb 7
+class _AllocationTracker(TorchDispatchMode):
+    "Follows the storages created by the ops run under it and keeps the peak of the bytes alive at once."
+    def __init__(self):
+        super(_AllocationTracker, self).__init__()
+        self.live, self.allocated, self.peak = {}, 0, 0
+
+    def _release(self, key):
+        self.allocated -= self.live.pop(key)
+
+    def __torch_dispatch__(self, func, types, args=(), kwargs=None):
+        kwargs = kwargs or {}
+        # in-place ops and views return storages of their inputs, which were allocated before
+        inputs = {t.untyped_storage().data_ptr() for t in tree_leaves((args, kwargs)) if isinstance(t, torch.Tensor)}
+        out = func(*args, **kwargs)
+        for t in tree_leaves(out):
+            if not isinstance(t, torch.Tensor):
+                continue
+            storage = t.untyped_storage()
+            key = storage.data_ptr()
+            if key in inputs or key in self.live or storage.nbytes() == 0:
+                continue
+            self.live[key] = storage.nbytes()
+            self.allocated += storage.nbytes()
+            self.peak = max(self.peak, self.allocated)
+            weakref.finalize(storage, self._release, key)
+        return out
+
+# %% ../nbs/09_benchmark.ipynb 8
+def _peak_allocated_mb(fn):
+    "Peak of the tensor memory allocated while `fn` runs."
+    tracker = _AllocationTracker()
+    with tracker:
+        fn()
+    return tracker.peak / 2**20
+
+# %% ../nbs/09_benchmark.ipynb 9
+def measure_latency(fn, # Callable without arguments running the module once
+                    repeats:int=10, # Number of timed runs
+                    warmup:int=2 # Number of untimed runs before timing
+                    ): # Dict with the median and p99 latency (ms) and the peak memory (MB)
+    """
+    Times `fn` on CPU and reports the median and 99th percentile of the latency. The peak memory is the
+    largest amount of tensor memory held at once by a separate, untimed run on top of what was allocated
+    before it (inputs and weights excluded), so it does not depend on the allocator or the platform.
+    """
+    with torch.no_grad():
+        for _ in range(warmup):
+            fn()
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        peak_mb = _peak_allocated_mb(fn)
+    return {'median_ms': float(np.median(times)) * 1e3, 'p99_ms': float(np.percentile(times, 99)) * 1e3,
+            'peak_mb': peak_mb}
+
+# %% ../nbs/09_benchmark.ipynb 10
+def _build(name):
+    "Builds the benchmarked module `name` from its config, in eval mode with a fixed initialization."
+    torch.manual_seed(0)
+    module = {'PillarFeatureNet': PillarFeatureNet, 'VoxelFeatureNet': VoxelFeatureNet, 'MVFFeatureNet': MVFFeatureNet,
+              'SparseResNet': SparseResNet, 'SparseResNet3D': SparseResNet3D, 'ASPPNeck': ASPPNeck}[name]
+    return module(**BENCHMARK_CONFIGS[name]).eval()
+
+# %% ../nbs/09_benchmark.ipynb 11
+def run_benchmark(modules:list=None, # Names of the modules to benchmark, all of `BENCHMARK_CONFIGS` by default
+                  densities:list=(30000, 150000, 300000), # Points per sample of the synthetic clouds
+                  batch_sizes:list=(1, 2, 4, 8), # Batch sizes
+                  repeats:int=10, # Number of timed runs per case
+                  warmup:int=2, # Number of untimed runs per case
+                  seed:int=0 # Seed of the synthetic clouds
+                  ): # Dict with the environment, the settings and one record per module, density and batch size
+    """
+    Benchmarks each module on CPU for every density and batch size. The readers run on the synthetic cloud,
+    the backbones on the output of the matching reader (`PillarFeatureNet` for `SparseResNet`,
+    `VoxelFeatureNet` for `SparseResNet3D`) and the neck on the output of `SparseResNet`; those inputs are
+    prepared outside the timed region. Throughput is counted in input points of the cloud per second.
+    """
+    modules = list(BENCHMARK_CONFIGS) if modules is None else list(modules)
+    needed = set(modules)
+    if needed & {'SparseResNet', 'ASPPNeck'}:
+        needed |= {'PillarFeatureNet', 'SparseResNet'} if 'ASPPNeck' in needed else {'PillarFeatureNet'}
+    if 'SparseResNet3D' in needed:
+        needed.add('VoxelFeatureNet')
+    built = {name: _build(name) for name in needed}
+    records = []
+    with torch.no_grad():
+        for num_points in densities:
+            for batch_size in batch_sizes:
+                points = synthetic_cloud(num_points, batch_size, seed=seed)
+                inputs = {'PillarFeatureNet': (points,), 'VoxelFeatureNet': (points,),
+                          'MVFFeatureNet': (points, batch_size)}
+                if {'SparseResNet', 'ASPPNeck'} & set(modules):
+                    features, coords, grid_size = built['PillarFeatureNet'](points)
+                    inputs['SparseResNet'] = (features, coords, grid_size, batch_size)
+                if 'ASPPNeck' in modules:
+                    inputs['ASPPNeck'] = (built['SparseResNet'](*inputs['SparseResNet']),)
+                if 'SparseResNet3D' in modules:
+                    features, coords, grid_size = built['VoxelFeatureNet'](points)
+                    inputs['SparseResNet3D'] = (features, coords, grid_size, batch_size)
+
+                for name in modules:
+                    module, args = built[name], inputs[name]
+                    stats = measure_latency(lambda: module(*args), repeats=repeats, warmup=warmup)
+                    records.append({'module': name, 'points': num_points, 'batch_size': batch_size, **stats,
+                                    'points_per_s': num_points * batch_size / stats['median_ms'] * 1e3})
+                del inputs
+
+    return {'environment': {'torch': torch.__version__, 'threads': torch.get_num_threads(),
+                            'cpu_count': os.cpu_count(), 'processor': platform.processor() or platform.machine(),
+                            'python': platform.python_version()},
+            'settings': {'densities': list(densities), 'batch_sizes': list(batch_sizes), 'repeats': repeats,
+                         'warmup': warmup, 'seed': seed},
+            'results': records}
+
+# %% ../nbs/09_benchmark.ipynb 12
+def compare_to_baseline(report:dict, # Report returned by `run_benchmark`
+                        baseline:dict, # Report of a previous run, e.g. the committed CPU baseline
+                        tolerance:float=0.25 # Allowed relative slowdown of the median latency
+                        ): # Records slower than the baseline by more than `tolerance`, with their slowdown
+    "Matches the records of both reports by module, density and batch size and returns the regressions."
+    key = lambda record: (record['module'], record['points'], record['batch_size'])
+    reference = {key(record): record for record in baseline['results']}
+    regressions = []
+    for record in report['results']:
+        ref = reference.get(key(record))
+        if ref is not None and record['median_ms'] > ref['median_ms'] * (1 + tolerance):
+            regressions.append({**record, 'baseline_ms': ref['median_ms'],
+                                'slowdown': record['median_ms'] / ref['median_ms']})
+    return regressions
+
+# %% ../nbs/09_benchmark.ipynb 13
+@call_parse
+def benchmark_cli(output:str='benchmark.json', # Path of the JSON report
+                  modules:str=None, # Comma separated module names, all by default
+                  densities:str='30000,150000,300000', # Comma separated points per sample
+                  batch_sizes:str='1,2,4,8', # Comma separated batch sizes
+                  repeats:int=10, # Number of timed runs per case
+                  warmup:int=2, # Number of untimed runs per case
+                  threads:int=None, # Number of intra-op CPU threads, torch's default if not set
+                  baseline:str=None, # Report to compare against, e.g. benchmarks/cpu_baseline.json
+                  tolerance:float=0.25 # Allowed relative slowdown before a case counts as a regression
+                  ):
+    "Runs the CPU latency benchmark, writes the JSON report and exits with an error on regressions."
+    if threads is not None:
+        torch.set_num_threads(threads)
+    split = lambda value: [int(v) for v in value.split(',')]
+    report = run_benchmark(modules.split(',') if modules else None, split(densities), split(batch_sizes),
+                           repeats=repeats, warmup=warmup)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=1)
+    for record in report['results']:
+        print(f"{record['module']:>16} {record['points']:>7} x {record['batch_size']}: "
+              f"median {record['median_ms']:9.1f} ms, p99 {record['p99_ms']:9.1f} ms, "
+              f"peak {record['peak_mb']:8.1f} MB, {record['points_per_s']:7.0f} points/s")
+    if baseline is not None:
+        with open(baseline) as f:
+            regressions = compare_to_baseline(report, json.load(f), tolerance)
+        for record in regressions:
+            print(f"REGRESSION {record['module']} {record['points']} x {record['batch_size']}: "
+                  f"{record['median_ms']:.1f} ms vs {record['baseline_ms']:.1f} ms ({record['slowdown']:.2f}x)")
+        if regressions:
+            raise SystemExit(1)
@@ -3,13 +3,18 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../../nbs/03_build_loader.ipynb.
 
 # %% auto 0
-__all__ = ['collate', 'build_dataloader']
+__all__ = ['collate', 'worker_init', 'build_dataloader', 'LocalitySampler', 'PrefetchLoader']
 
 # %% ../../nbs/03_build_loader.ipynb 2
 from collections import defaultdict
+import os
+import queue
+import threading
+import time
+import zlib
 import numpy as np
 import torch
-from torch.utils.data import DataLoader
+from torch.utils.data import DataLoader, IterableDataset, Sampler
 from torch.utils.data.distributed import DistributedSampler
 import torch.distributed as dist
 
@@ -41,35 +46,251 @@ def collate(batch_list):
             for kk, vv in ret[key].items():
                 res.append(torch.stack(vv))
             ret[key] = res
+        elif key == "gt_boxes":
+            # the boxes kept by `BatchAffineAugmentation.keep_boxes`, a different number per sample, one tensor per sample
+            ret[key] = [torch.tensor(elem) for elem in elems]
         else:
             ret[key] = torch.tensor(np.stack(elems, axis=0)).float()
+    # keep the number of samples explicit, a sample may have no points left after range filtering
+    ret["batch_size"] = len(batch_list)
 
     return ret
 
 # %% ../../nbs/03_build_loader.ipynb 7
+def worker_init(worker_id): # Index of the worker in the DataLoader
+    """This function runs once in every DataLoader worker and lets the dataset prepare its worker-local state."""
+    dataset = torch.utils.data.get_worker_info().dataset
+    if hasattr(dataset, "worker_init"):
+        dataset.worker_init()
+
+# %% ../../nbs/03_build_loader.ipynb 8
 def build_dataloader(dataset, # Dataset object
                      batch_size=4, # Batch size
                      num_workers=8, # Number of workers
                      shuffle:bool=False, # Shuffle the data
-                     pin_memory=False # Pin memory
+                     locality:bool=False, # In distributed training, give each node the same part of the dataset every epoch (`LocalitySampler`)
+                     pin_memory=False, # Pin memory
+                     persistent_workers=False, # Keep the workers, and their state, alive between epochs
+                     prefetch_factor=None, # Number of batches loaded in advance by each worker, PyTorch's default if None
+                     worker_init_fn=worker_init # Function run once in each worker
                      ): # A PyTorch DataLoader instance with the specified configuration.
     """This function is designed to build a DataLoader object for a given dataset with optional distributed training support."""
-    if dist.is_initialized():
+    if isinstance(dataset, IterableDataset):
+        sampler = None  # e.g. a `ShardDataset`, which splits and shuffles its samples itself
+    elif dist.is_initialized():
         rank = dist.get_rank()
         world_size = dist.get_world_size()
-        sampler = DistributedSampler(
-            dataset, num_replicas=world_size, rank=rank, shuffle=shuffle)
+        if locality:
+            sampler = LocalitySampler(dataset, num_replicas=world_size, rank=rank, shuffle=shuffle)
+        else:
+            sampler = DistributedSampler(
+                dataset, num_replicas=world_size, rank=rank, shuffle=shuffle)
     else:
         sampler = None
 
+    # the worker options only exist when the data is loaded by worker processes
+    worker_options = dict(persistent_workers=persistent_workers, prefetch_factor=prefetch_factor,
+                          worker_init_fn=worker_init_fn) if num_workers > 0 else {}
+
     data_loader = DataLoader(
         dataset,
         batch_size=batch_size,
         sampler=sampler,
-        shuffle=(sampler is None and shuffle),
+        shuffle=(sampler is None and shuffle and not isinstance(dataset, IterableDataset)),
         num_workers=num_workers,
         collate_fn=collate,
         pin_memory=pin_memory,
+        **worker_options,
     )
 
     return data_loader
+
+# %% ../../nbs/03_build_loader.ipynb 12
+class LocalitySampler(Sampler):
+    """
+    The `LocalitySampler` class is a distributed sampler that gives each node (the ranks of one machine) the same part
+    of the dataset every epoch, so that the files a node reads stay in its page cache or local cache. The samples are
+    assigned to the nodes by a hash of their token, the partition is rebalanced only when a node holds too many, and
+    the samples of a node are shuffled and split between its ranks each epoch.
+    """
+
+    def __init__(self,
+                 dataset, # Dataset to sample, with the `infos` of its samples (each with a `token`), or any map-style dataset
+                 num_replicas=None, # Number of ranks, the world size of the process group by default
+                 rank=None, # Rank of this process, its rank in the process group by default
+                 local_world_size=None, # Number of ranks per node, the LOCAL_WORLD_SIZE set by torchrun by default
+                 shuffle=True, # Shuffle the samples of the node each epoch
+                 seed=0, # Seed of the shuffles, combined with the epoch
+                 balance_tolerance=0.05 # Relative excess over an even share a node may hold before the partition is rebalanced
+                 ): # Locality-aware distributed sampler
+        num_replicas = dist.get_world_size() if num_replicas is None else num_replicas
+        rank = dist.get_rank() if rank is None else rank
+        if local_world_size is None:
+            local_world_size = int(os.environ.get("LOCAL_WORLD_SIZE", num_replicas))
+        assert num_replicas % local_world_size == 0, "Every node must run the same number of ranks"
+        self.local_world_size = local_world_size
+        self.num_nodes = num_replicas // local_world_size
+        self.node, self.local_rank = divmod(rank, local_world_size)
+        self.shuffle = shuffle
+        self.seed = seed
+        self.balance_tolerance = balance_tolerance
+        self.epoch = 0
+
+        # the copies of a sample made by `cbgs` share its token, so they go to the same node
+        keys = [info["token"] for info in dataset.infos] if hasattr(dataset, "infos") else range(len(dataset))
+        self.nodes = self._partition(keys)
+        self.num_samples = -(-np.bincount(self.nodes, minlength=self.num_nodes).max() // local_world_size)
+
+    def _partition(self, keys): # Node of each sample
+        # the samples are placed by key, so that all the copies of a key land on the same node
+        keys, inverse, copies = np.unique(np.array([str(key) for key in keys]), return_inverse=True, return_counts=True)
+        hashes = np.array([zlib.crc32(key.encode()) for key in keys], dtype=np.int64)
+        nodes = hashes % self.num_nodes
+        counts = np.bincount(nodes, weights=copies, minlength=self.num_nodes).astype(np.int64)
+        limit = -(-len(inverse) // self.num_nodes) * (1 + self.balance_tolerance)
+        # move keys of an overfull node, largest hashes first, to the emptiest nodes until it is back within the limit
+        order = np.argsort(-hashes, kind="stable")
+        for node in np.flatnonzero(counts > limit):
+            for key in order[nodes[order] == node]:
+                if counts[node] <= limit:
+                    break
+                nodes[key] = np.argmin(counts)
+                counts[nodes[key]] += copies[key]
+                counts[node] -= copies[key]
+        return nodes[inverse]
+
+    def __len__(self): # Samples of this rank in an epoch, the same on every rank
+        return self.num_samples
+
+    def set_epoch(self, epoch): # Sets the epoch of the shuffle, as `DistributedSampler.set_epoch`
+        self.epoch = epoch
+
+    def __iter__(self):
+        indices = np.flatnonzero(self.nodes == self.node)
+        if not len(indices):  # More nodes than keys: this node has nothing of its own and draws from the whole dataset
+            indices = np.arange(len(self.nodes))
+        if self.shuffle:
+            indices = np.random.default_rng([self.seed, self.epoch]).permutation(indices)  # The same on the ranks of a node
+        # pad with samples of the node, so that every rank of every node has as many samples
+        indices = np.resize(indices, self.num_samples * self.local_world_size)
+        return iter(indices[self.local_rank::self.local_world_size].tolist())
+
+# %% ../../nbs/03_build_loader.ipynb 16
+_END = object()  # marks the end of the wrapped loader
+
+def _to_device(batch, device, non_blocking=False):
+    "Moves every tensor of a collated batch (dicts, lists and tuples of tensors) to `device`."
+    if isinstance(batch, torch.Tensor):
+        if device.type == 'cuda' and not batch.is_pinned():
+            batch = batch.pin_memory()  # page-locked memory lets the copy run asynchronously
+        return batch.to(device, non_blocking=non_blocking)
+    if isinstance(batch, dict):
+        return {k: _to_device(v, device, non_blocking) for k, v in batch.items()}
+    if isinstance(batch, (list, tuple)):
+        return type(batch)(_to_device(v, device, non_blocking) for v in batch)
+    return batch
+
+def _tensors(batch):
+    "Tensors of a collated batch."
+    if isinstance(batch, torch.Tensor):
+        yield batch
+    elif isinstance(batch, dict):
+        for v in batch.values():
+            yield from _tensors(v)
+    elif isinstance(batch, (list, tuple)):
+        for v in batch:
+            yield from _tensors(v)
+
+# %% ../../nbs/03_build_loader.ipynb 17
+class PrefetchLoader:
+    """
+    The `PrefetchLoader` class wraps a data loader so that the next batches are fetched and moved to `device` while
+    the current one is being consumed. A background thread pulls the batches from the loader; on CUDA it pins them
+    and issues the host to device copies on a side stream, which the consumer's stream waits for only when the batch
+    is handed over. The time the consumer spends waiting for each batch is recorded in `wait_times`.
+    """
+
+    def __init__(self,
+                 loader, # DataLoader, or any iterable of collated batches
+                 device=None, # Device the batches are moved to, the batches are left where they are if None
+                 num_prefetch:int=2, # Number of batches fetched ahead of the consumer
+                 transform=None # Callable applied to each batch once on the device, e.g. a `BatchAffineAugmentation`
+                 ):
+        assert num_prefetch > 0, "Prefetch at least one batch"
+        self.loader = loader
+        self.device = torch.device(device) if device is not None else None
+        if self.device is not None and self.device.type == 'cuda' and self.device.index is None:
+            # the producer thread selects the device by index, 'cuda' means the current one
+            self.device = torch.device('cuda', torch.cuda.current_device())
+        self.num_prefetch = num_prefetch
+        self.transform = transform
+        self.wait_times = []  # seconds the consumer waited for each batch of the last iteration
+
+    def __len__(self):
+        return len(self.loader)
+
+    def _produce(self, batches, stop, stream):
+        def put(item): # Gives up once the consumer stopped iterating
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        try:
+            if stream is not None:
+                torch.cuda.set_device(self.device)
+            for batch in self.loader:
+                ready = None
+                if stream is not None:
+                    with torch.cuda.stream(stream):
+                        batch = _to_device(batch, self.device, non_blocking=True)
+                        if self.transform is not None:
+                            batch = self.transform(batch)
+                        ready = torch.cuda.Event()
+                        ready.record(stream)
+                elif self.device is not None:
+                    batch = _to_device(batch, self.device)
+                if self.transform is not None and stream is None:
+                    batch = self.transform(batch)
+                if not put((batch, ready)):
+                    return
+            put(_END)
+        except Exception as error:  # raised again in the consumer
+            put(error)
+
+    def __iter__(self):
+        self.wait_times = []
+        stream = torch.cuda.Stream(self.device) if self.device is not None and self.device.type == 'cuda' else None
+        batches, stop = queue.Queue(maxsize=self.num_prefetch), threading.Event()
+        producer = threading.Thread(target=self._produce, args=(batches, stop, stream), daemon=True)
+        producer.start()
+        try:
+            while True:
+                start = time.perf_counter()
+                item = batches.get()
+                self.wait_times.append(time.perf_counter() - start)
+                if item is _END:
+                    self.wait_times.pop()  # the end of the loader is not a late batch
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                batch, ready = item
+                if ready is not None:
+                    current = torch.cuda.current_stream(self.device)
+                    current.wait_event(ready)
+                    for tensor in _tensors(batch):
+                        tensor.record_stream(current)  # the memory belongs to the consumer's stream from now on
+                yield batch
+        finally:
+            stop.set()
+            producer.join()
+
+    def wait_summary(self): # Total, mean and max wait of the consumer and the number of batches it waited more than 1 ms for
+        waits = np.array(self.wait_times) * 1e3
+        return {'batches': len(waits), 'total_wait_ms': float(waits.sum()),
+                'mean_wait_ms': float(waits.mean()) if len(waits) else 0.0,
+                'max_wait_ms': float(waits.max()) if len(waits) else 0.0,
+                'late_batches': int((waits > 1).sum())}
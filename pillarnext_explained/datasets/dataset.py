@@ -3,27 +3,27 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../../nbs/02_dataset.ipynb.
 
 # %% auto 0
-__all__ = ['cls_attr_dist', 'points_in_boxes_jit', 'points_in_rbbox', 'BaseDataset', 'eval_main', 'NuScenesDataset']
+__all__ = ['cls_attr_dist', 'points_in_boxes_jit', 'points_in_rbbox', 'affine_points_jit', 'voxel_keys_jit', 'compile_kernels',
+           'BaseDataset', 'eval_main', 'NuScenesDataset', 'SweepDecimation', 'SweepBuffer', 'GTDatabaseSampler',
+           'GlobalAffineAugmentation', 'BatchAffineAugmentation']
 
 # %% ../../nbs/02_dataset.ipynb 2
 import numpy as np
+import torch
 from torch.utils.data import Dataset
 from pathlib import Path
 import os
+import time
+from collections import OrderedDict
 import json
 import operator
 import itertools
 import pickle
 import numba
-from pyquaternion import Quaternion
-
-from nuscenes import NuScenes
-from nuscenes.utils.data_classes import Box
-from nuscenes.eval.detection.config import config_factory
-from nuscenes.eval.detection.evaluate import NuScenesEval
+from .point_format import QUANTIZED_SUFFIX, read_quantized
 
 # %% ../../nbs/02_dataset.ipynb 4
-@numba.njit
+@numba.njit(cache=True) # the machine code is cached on disk, new processes load it instead of compiling
 def points_in_boxes_jit(points: np.ndarray, # Float array [N, *]
                         boxes: np.ndarray, # Float array [M, 7] or [M, 9], with first 6 dimensions x, y, z, length, width, height, last dimension yaw angle
                         indices: np.ndarray # Bool array of shape [N, M]
@@ -52,7 +52,76 @@ def points_in_rbbox(points: np.ndarray, # Float array [N, *]
     points_in_boxes_jit(points, boxes, indices)
     return indices
 
+# %% ../../nbs/02_dataset.ipynb 6
+@numba.njit(cache=True)
+def affine_points_jit(points: np.ndarray, # Float array [N, *], with x, y, z in the first three columns
+                      matrix: np.ndarray # Float array [4, 4], affine transform of the coordinates
+                      ): # The coordinates of `points` are overwritten
+    """This function applies an affine transform to the coordinates of a set of points, in place and in a single pass."""
+    for i in range(points.shape[0]):
+        x, y, z = points[i, 0], points[i, 1], points[i, 2]
+        points[i, 0] = matrix[0, 0] * x + matrix[0, 1] * y + matrix[0, 2] * z + matrix[0, 3]
+        points[i, 1] = matrix[1, 0] * x + matrix[1, 1] * y + matrix[1, 2] * z + matrix[1, 3]
+        points[i, 2] = matrix[2, 0] * x + matrix[2, 1] * y + matrix[2, 2] * z + matrix[2, 3]
+
+# %% ../../nbs/02_dataset.ipynb 7
+@numba.njit(cache=True)
+def voxel_keys_jit(points: np.ndarray, # Float array [N, *], with x, y, z in the first three columns
+                   far: float, # Voxel edge of the points at near_range or beyond
+                   near: float, # Voxel edge of the points within near_range
+                   near_range: float, # Horizontal distance from the origin under which the `near` grid is used
+                   keys: np.ndarray # Int64 array [N], key of the voxel of each point
+                   ): # `keys` is overwritten
+    """This function computes the key of the voxel each point falls in, on a grid that is coarser near the origin: 20 bits per axis and the grid of the point."""
+    for i in range(points.shape[0]):
+        x, y, z = points[i, 0], points[i, 1], points[i, 2]
+        is_near = x * x + y * y < near_range * near_range
+        size = near if is_near else far
+        keys[i] = (((np.int64(np.floor(x / size)) + 524288) << 41) | ((np.int64(np.floor(y / size)) + 524288) << 21) |
+                   ((np.int64(np.floor(z / size)) + 524288) << 1) | np.int64(is_near))
+
+# %% ../../nbs/02_dataset.ipynb 8
+# Explicit signatures of the numba kernels, compiled (or loaded from numba's cache) by `compile_kernels`: the arrays of
+# the loading pipeline (C-contiguous float32), views such as `points[:, :3]`, and double precision inputs
+_KERNEL_SIGNATURES = [
+    (points_in_boxes_jit, ["void(float32[:, ::1], float32[:, ::1], boolean[:, ::1])",
+                           "void(float32[:, :], float32[:, :], boolean[:, ::1])",
+                           "void(float64[:, ::1], float64[:, ::1], boolean[:, ::1])"]),
+    (affine_points_jit, ["void(float32[:, ::1], float64[:, ::1])",
+                         "void(float64[:, ::1], float64[:, ::1])"]),
+    (voxel_keys_jit, ["void(float32[:, ::1], float64, float64, float64, int64[::1])",
+                      "void(float32[:, :], float64, float64, float64, int64[::1])"]),
+]
+
 # %% ../../nbs/02_dataset.ipynb 9
+def compile_kernels(verbose:bool=False # Print the report of every kernel
+                    ): # Dict with the signatures, signatures loaded by this call, cache hits, cache misses, cache path and seconds spent for each kernel
+    """This function compiles the numba kernels of the dataset for their explicit signatures, loading them from numba's on-disk cache when possible, and reports whether the cache was hit."""
+    report = {}
+    for kernel, signatures in _KERNEL_SIGNATURES:
+        start = time.perf_counter()
+        loaded = 0
+        for signature in signatures:
+            args, _ = numba.core.sigutils.normalize_signature(signature)
+            if tuple(args) in kernel.overloads:
+                continue  # Already in the process, e.g. a worker forked from a main process that loaded it
+            kernel.compile(signature)  # Loads from the cache, compiles and writes to it on a miss
+            loaded += 1
+        report[kernel.__name__] = {
+            'signatures': signatures,
+            'loaded': loaded,
+            'cache_hits': sum(kernel.stats.cache_hits.values()),
+            'cache_misses': sum(kernel.stats.cache_misses.values()),
+            'cache_path': kernel.stats.cache_path,
+            'seconds': time.perf_counter() - start,
+        }
+        if verbose:
+            entry = report[kernel.__name__]
+            print(f"{kernel.__name__}: {entry['cache_hits']} cache hits, {entry['cache_misses']} cache misses "
+                  f"in {entry['seconds']:.2f} s ({entry['cache_path']})")
+    return report
+
+# %% ../../nbs/02_dataset.ipynb 16
 class BaseDataset(Dataset):
     """
     The `BaseDataset` class is designed to serve as a base class for different types of datasets.
@@ -81,6 +150,7 @@ class BaseDataset(Dataset):
         self.create_database = create_database
         self.use_gt_sampling = use_gt_sampling
         self.load_infos()
+        compile_kernels()  # once in the main process, the DataLoader workers forked from it inherit the kernels
         if use_gt_sampling and sampler is not None:
             self.sampler = sampler()
         else:
@@ -93,6 +163,13 @@ class BaseDataset(Dataset):
         with open(os.path.join(self._root_path, self._info_path), "rb") as f:
             self.infos = pickle.load(f)
 
+    def worker_init(self): # Prepares the dataset in a DataLoader worker, before its first sample
+        compile_kernels()  # nothing left to do in a forked worker, loads the kernels from numba's cache in a spawned one
+        augmentations = [] if self.augmentations is None else list(self.augmentations.values())
+        for stage in [self.sampler] + augmentations:
+            if hasattr(stage, "worker_init"):
+                stage.worker_init()  # e.g. a random stream per worker
+
     def evaluation(self):
         """Dataset must provide a evaluation function to evaluate model."""
         # support different evaluation tasks
@@ -110,8 +187,9 @@ class BaseDataset(Dataset):
         return res
 
     def __getitem__(self, idx):
+        return self.get_sample(self.infos[idx])
 
-        info = self.infos[idx]
+    def get_sample(self, info): # Runs the pipelines on an info entry, from `__getitem__` or from the records of a sharded copy of the dataset
         res = {"token": info["token"]}
 
         if self.loading_pipelines is not None:
@@ -158,7 +236,7 @@ class BaseDataset(Dataset):
     def format_eval(self):
         raise NotImplementedError
 
-# %% ../../nbs/02_dataset.ipynb 10
+# %% ../../nbs/02_dataset.ipynb 17
 def _second_det_to_nusc_box(detection):
     """
     Convert a detection output from a second model to nuScenes box format.
@@ -172,6 +250,9 @@ def _second_det_to_nusc_box(detection):
     Returns:
         list: A list of nuScenes Box objects.
     """
+    from pyquaternion import Quaternion
+    from nuscenes.utils.data_classes import Box
+
     box3d = detection["box3d_lidar"].detach().cpu().numpy()
     scores = detection["scores"].detach().cpu().numpy()
     labels = detection["label_preds"].detach().cpu().numpy()
@@ -191,7 +272,7 @@ def _second_det_to_nusc_box(detection):
         box_list.append(box)
     return box_list
 
-# %% ../../nbs/02_dataset.ipynb 11
+# %% ../../nbs/02_dataset.ipynb 18
 def _lidar_nusc_box_to_global(nusc, boxes, sample_token):
     """
     Transform nuScenes boxes from the LiDAR coordinate system to the global coordinate system.
@@ -204,6 +285,8 @@ def _lidar_nusc_box_to_global(nusc, boxes, sample_token):
     Returns:
         list: A list of transformed nuScenes Box objects in the global coordinate system.
     """
+    from pyquaternion import Quaternion
+
     try:
         s_record = nusc.get("sample", sample_token)
         sample_data_token = s_record["data"]["LIDAR_TOP"]
@@ -226,7 +309,7 @@ def _lidar_nusc_box_to_global(nusc, boxes, sample_token):
         box_list.append(box)
     return box_list
 
-# %% ../../nbs/02_dataset.ipynb 13
+# %% ../../nbs/02_dataset.ipynb 20
 # Class attribute distribution
 cls_attr_dist = {
     "barrier": {
@@ -341,7 +424,7 @@ cls_attr_dist = {
     },
 }
 
-# %% ../../nbs/02_dataset.ipynb 15
+# %% ../../nbs/02_dataset.ipynb 22
 def eval_main(nusc, # NuScenes dataset object.
               eval_version, # Version of the evaluation configuration to use.
               res_path, # Path to the results file.
@@ -352,6 +435,11 @@ def eval_main(nusc, # NuScenes dataset object.
     Evaluate the detection results on the nuScenes dataset.
     """
 
+    # the devkit (and the scikit-learn/matplotlib stack behind it) is only needed here,
+    # so it is imported on the first evaluation instead of with the module
+    from nuscenes.eval.detection.config import config_factory
+    from nuscenes.eval.detection.evaluate import NuScenesEval
+
     cfg = config_factory(eval_version)
 
     nusc_eval = NuScenesEval(
@@ -364,7 +452,7 @@ def eval_main(nusc, # NuScenes dataset object.
     )
     _ = nusc_eval.main(plot_examples=0,)
 
-# %% ../../nbs/02_dataset.ipynb 16
+# %% ../../nbs/02_dataset.ipynb 23
 class NuScenesDataset(BaseDataset): # NuScenes dataset class
     """
     The `NuScenesDataset` class is designed to handle the NuScenes dataset.
@@ -384,7 +472,13 @@ class NuScenesDataset(BaseDataset): # NuScenes dataset class
                  evaluations=None,  # Evaluation methods
                  create_database=False,  # Whether to create a database
                  use_gt_sampling=True,  # Whether to use ground truth sampling
-                 version="v1.0-trainval" # Dataset version
+                 version="v1.0-trainval", # Dataset version
+                 sweep_cache_size=0, # Number of recently read sweep files kept in memory by each worker, 0 to disable
+                 crop_range=None, # [x_min, y_min, z_min, x_max, y_max, z_max] the `crop_points` loading pipeline keeps, usually the pc_range of the reader
+                 crop_height=False, # Whether `crop_points` also crops along z, only for readers that drop the points outside the z range
+                 crop_margin=0.01, # Distance the range is enlarged by on each side, so that the points a reader keeps despite rounding are kept
+                 sweep_decimation=None, # `SweepDecimation` policy applied to the sweeps fused with the key frame, None to keep every point
+                 quantized_points=False # Whether to read the quantized `.qbin` files written next to the `.bin` files of the infos
                  ): # NuScenes dataset
 
         super(NuScenesDataset, self).__init__(
@@ -396,6 +490,13 @@ class NuScenesDataset(BaseDataset): # NuScenes dataset class
 
         self._class_names = list(itertools.chain(*[t for t in class_names]))  # Flatten class names list
         self.version = version
+        self.sweep_cache_size = sweep_cache_size
+        self._sweep_cache = OrderedDict()  # path -> points, least recently used first
+        self.crop_range = None if crop_range is None else np.asarray(crop_range, dtype=np.float32)
+        self.crop_height = crop_height
+        self.crop_margin = crop_margin
+        self.sweep_decimation = sweep_decimation
+        self.quantized_points = quantized_points
 
         if resampling:
             self.cbgs()  # Resample dataset if needed
@@ -420,22 +521,46 @@ class NuScenesDataset(BaseDataset): # NuScenes dataset class
 
         self.infos = _nusc_infos  # Update dataset information
 
-    def read_file(self, path, num_point_feature=4): # Reads a point cloud file and returns the points in the specified format
-        points = np.fromfile(os.path.join(self._root_path, path),
-                             dtype=np.float32).reshape(-1, 5)[:, :num_point_feature]  # Read point cloud file and reshape
+    def read_file(self, path, num_point_feature=4): # Reads a point cloud file, float32 x 5 or quantized, and returns the points in the specified format
+        path = os.path.join(self._root_path, path)
+        if self.quantized_points and path.endswith(".bin"):
+            path = path[:-len(".bin")] + QUANTIZED_SUFFIX  # The quantized copy of the file
+        if path.endswith(QUANTIZED_SUFFIX):
+            return read_quantized(path, num_point_feature)  # Points of shape (N, num_point_feature)
+        points = np.fromfile(path, dtype=np.float32).reshape(-1, 5)[:, :num_point_feature]  # Read point cloud file and reshape
         return points  # Return points of shape (N, num_point_feature)
 
+    def worker_init(self): # Prepares the dataset in a DataLoader worker, with a sweep cache of its own
+        super(NuScenesDataset, self).worker_init()
+        self._sweep_cache = OrderedDict()
+
+    def read_sweep_file(self, path): # Reads a sweep file, from the cache of recently read sweeps when it is enabled
+        if self.sweep_cache_size == 0:
+            return self.read_file(path)
+        if path in self._sweep_cache:
+            self._sweep_cache.move_to_end(path)  # Most recently used
+        else:
+            self._sweep_cache[path] = self.read_file(path)
+            if len(self._sweep_cache) > self.sweep_cache_size:
+                self._sweep_cache.popitem(last=False)  # Evict the least recently used sweep
+        return self._sweep_cache[path].copy()  # The caller transforms the points in place
+
     def read_sweep(self, sweep, min_distance=1.0): # Reads a sweep file, applies transformations, removes points too close to the origin, and returns the points and their timestamps
-        points_sweep = self.read_file(str(sweep["lidar_path"])).T  # Read sweep file and transpose, shape (num_point_feature, N)
+        if "lidar_points" in sweep:  # Points of a sharded record, read with the sample
+            points_sweep = sweep["lidar_points"].T
+        else:
+            points_sweep = self.read_sweep_file(str(sweep["lidar_path"])).T  # Read sweep file and transpose, shape (num_point_feature, N)
 
         nbr_points = points_sweep.shape[1]
         if sweep["transform_matrix"] is not None:
             points_sweep[:3, :] = sweep["transform_matrix"].dot(
                 np.vstack((points_sweep[:3, :], np.ones(nbr_points))))[:3, :]  # Apply transformation matrix
-        points_sweep = self.remove_close(points_sweep, min_distance)  # Remove points too close to the origin
-        curr_times = sweep["time_lag"] * np.ones((1, points_sweep.shape[1]))  # Create current times array
+        points_sweep = self.remove_close(points_sweep, min_distance).T  # Remove points too close to the origin, shape (N, num_point_feature)
+        if self.sweep_decimation is not None:
+            points_sweep = self.sweep_decimation(points_sweep, sweep["time_lag"])  # Thin out the redundant points of older sweeps
+        curr_times = sweep["time_lag"] * np.ones((points_sweep.shape[0], 1))  # Create current times array
 
-        return points_sweep.T, curr_times.T  # Return points and times of shape (N, num_point_feature), (N, 1)
+        return points_sweep, curr_times  # Return points and times of shape (N, num_point_feature), (N, 1)
 
     @staticmethod
     def remove_close(points, radius: float): # Removes points that are too close to the origin
@@ -451,9 +576,16 @@ class NuScenesDataset(BaseDataset): # NuScenes dataset class
 
     def load_pointcloud(self, res, info): # Loads a point cloud and its sweeps, concatenating them together with their timestamps
 
+        if "points" in info:  # Fused points of a sharded record
+            res["points"] = info["points"]
+            return res
+
         lidar_path = info["lidar_path"]
 
-        points = self.read_file(str(lidar_path))  # Read point cloud file
+        if "lidar_points" in info:  # Points of a sharded record, read with the sample
+            points = info["lidar_points"]
+        else:
+            points = self.read_file(str(lidar_path))  # Read point cloud file
 
         sweep_points_list = [points]  # Initialize sweep points list
         sweep_times_list = [np.zeros((points.shape[0], 1))]  # Initialize sweep times list
@@ -471,6 +603,70 @@ class NuScenesDataset(BaseDataset): # NuScenes dataset class
 
         return res  # Return updated result
 
+    def create_gt_database(self,
+                           db_path, # Directory the database is written to
+                           class_names=None, # Classes whose objects are stored, every class of the dataset by default
+                           min_points=1 # Objects with fewer points inside their box are not stored
+                           ): # Number of objects stored per class
+        """
+        Builds the ground-truth database used by `GTDatabaseSampler`. The points inside each annotated box are written,
+        relative to the box center, one object after the other into a single `points.bin` file, and `index.npz` holds
+        the metadata of the objects grouped by class: boxes, offsets and lengths into the points, and the first object
+        and number of objects of each class.
+        """
+        class_names = self._class_names if class_names is None else list(class_names)
+        db_path = Path(db_path)
+        db_path.mkdir(parents=True, exist_ok=True)
+
+        class_ids, boxes, point_offsets, point_counts = [], [], [], []
+        num_points, num_features, box_dim, tokens = 0, 0, 9, set()
+        with open(db_path / "points.bin", "wb") as f:
+            for info in self.infos:
+                if info["token"] in tokens:  # Resampled datasets repeat frames
+                    continue
+                tokens.add(info["token"])
+                res = self.load_box3d(self.load_pointcloud({"token": info["token"]}, info), info)
+                points = res["points"].astype(np.float32)
+                gt_boxes, gt_names = res["annotations"]["gt_boxes"], res["annotations"]["gt_names"]
+                num_features, box_dim = points.shape[1], gt_boxes.shape[1]
+
+                keep = np.isin(gt_names, class_names)
+                gt_boxes, gt_names = gt_boxes[keep], gt_names[keep]
+                indices = points_in_rbbox(points, gt_boxes)  # Shape (N, M)
+                for i in range(len(gt_boxes)):
+                    object_points = points[indices[:, i]]
+                    if len(object_points) < min_points:
+                        continue
+                    object_points[:, :3] -= gt_boxes[i, :3]  # Relative to the box center
+                    f.write(object_points.tobytes())
+                    class_ids.append(class_names.index(gt_names[i]))
+                    boxes.append(gt_boxes[i])
+                    point_offsets.append(num_points)
+                    point_counts.append(len(object_points))
+                    num_points += len(object_points)
+
+        class_ids = np.array(class_ids, dtype=np.int64)
+        order = np.argsort(class_ids, kind="stable")  # Objects of a class are contiguous in the index
+        class_counts = np.bincount(class_ids, minlength=len(class_names))
+        np.savez(db_path / "index.npz",
+                 class_names=np.array(class_names),
+                 class_offsets=np.concatenate([[0], np.cumsum(class_counts)[:-1]]).astype(np.int64),
+                 class_counts=class_counts.astype(np.int64),
+                 boxes=np.array(boxes, dtype=np.float32).reshape(-1, box_dim)[order],
+                 point_offsets=np.array(point_offsets, dtype=np.int64)[order],
+                 point_counts=np.array(point_counts, dtype=np.int64)[order],
+                 num_point_features=np.int64(num_features))
+        return dict(zip(class_names, class_counts.tolist()))
+
+    def crop_points(self, res, info): # Drops the points outside `crop_range`, before they are augmented, collated and sent to the device
+        assert self.crop_range is not None, "crop_points needs a crop_range"
+        axes = 3 if self.crop_height else 2
+        low = self.crop_range[:axes] - self.crop_margin
+        high = self.crop_range[3:3 + axes] + self.crop_margin
+        coords = res["points"][:, :axes]
+        res["points"] = res["points"][((coords >= low) & (coords < high)).all(1)]
+        return res
+
     def evaluation(self, detections, output_dir=None, testset=False): # Evaluates detections against the dataset, calculates metrics, and optionally performs resampling. It returns the results or None if the evaluation is not performed
         version = self.version
         eval_set_map = {
@@ -486,6 +682,8 @@ class NuScenesDataset(BaseDataset): # NuScenes dataset class
             "meta": None,
         }
 
+        from nuscenes import NuScenes
+
         nusc = NuScenes(version=version, dataroot=str(
             self._root_path), verbose=True)  # Initialize NuScenes dataset
 
@@ -591,3 +789,316 @@ class NuScenesDataset(BaseDataset): # NuScenes dataset class
             return res['results']  # Return results
         else:
             return None  # Return None if no results
+
+# %% ../../nbs/02_dataset.ipynb 32
+class SweepDecimation:
+    """
+    The `SweepDecimation` class is a voxel-grid decimation policy for the sweeps fused into a frame. Each sweep keeps
+    one point per voxel of a grid that gets coarser with the time lag of the sweep, and coarser again near the sensor,
+    where the LiDAR is densest.
+    """
+
+    def __init__(self,
+                 voxel_size=0.1, # Voxel edge for a sweep with no time lag, in meters
+                 time_growth=2.0, # Relative growth of the voxel edge per second of time lag, the edge is voxel_size * (1 + time_growth * time_lag)
+                 near_range=10.0, # Horizontal distance from the sensor under which the grid is coarser
+                 near_scale=2.0, # Factor of the voxel edge for the points within near_range
+                 min_time_lag=0.0 # Sweeps with a time lag up to this value are kept whole
+                 ): # Sweep decimation policy
+        assert voxel_size > 0 and near_scale > 0, "The voxel edges must be positive"
+        self.voxel_size = voxel_size
+        self.time_growth = time_growth
+        self.near_range = near_range
+        self.near_scale = near_scale
+        self.min_time_lag = min_time_lag
+
+    def voxel_sizes(self, time_lag): # Voxel edges of a sweep, far from and near the sensor
+        far = self.voxel_size * (1.0 + self.time_growth * time_lag)
+        return far, far * self.near_scale
+
+    def __call__(self,
+                 points, # Points of a sweep in the frame of the key frame, shape (N, F) with x, y, z first
+                 time_lag # Time between the sweep and the key frame, in seconds
+                 ): # Points kept, one per voxel, in their original order
+        if time_lag <= self.min_time_lag or len(points) == 0:
+            return points
+        far, near = self.voxel_sizes(time_lag)
+        keys = np.empty(len(points), dtype=np.int64)  # 20 bits per axis, a range of +-52 km for a 0.1 m voxel
+        voxel_keys_jit(points, far, near, self.near_range, keys)
+        order = np.argsort(keys)  # Faster than the stable sort of np.unique(..., return_index=True)
+        sorted_keys = keys[order]
+        keep = np.zeros(len(points), dtype=bool)
+        keep[order[np.concatenate([[True], sorted_keys[1:] != sorted_keys[:-1]])]] = True  # A point per voxel
+        return points[keep]
+
+# %% ../../nbs/02_dataset.ipynb 36
+class SweepBuffer:
+    """
+    The `SweepBuffer` class accumulates LiDAR sweeps for streaming inference. It keeps the points of the last `nsweeps`
+    sweeps in their own sensor frame, with their pose, and fuses them into one preallocated array laid out as
+    `[batch_id, x, y, z, intensity, time_lag]`, so that the frame can be handed to the readers as is. The fused frame is
+    the one `NuScenesDataset.load_pointcloud` builds for the same sweeps: the newest sweep as it is, then the older
+    ones moved into its frame and stripped of the points close to the sensor.
+    """
+
+    def __init__(self,
+                 nsweeps, # Number of sweeps to keep, the newest one included
+                 num_point_feature=4, # Number of features read from each sweep (x, y, z, intensity)
+                 min_distance=1.0, # Radius around the sensor whose points are removed from the older sweeps, as in `NuScenesDataset.read_sweep`
+                 capacity=400000 # Initial number of points the array can hold, it grows when a frame does not fit
+                 ): # Streaming sweep buffer
+        assert nsweeps > 0, "At least input one sweep please!"
+        self.nsweeps = nsweeps
+        self.num_point_feature = num_point_feature
+        self.min_distance = min_distance
+        self._buffer = np.zeros((capacity, num_point_feature + 2), dtype=np.float32)
+        self._sweeps = [] # (points in the sensor frame, timestamp, pose) of the sweeps, newest first
+        self._size = 0 # Number of points of the fused frame
+
+    def __len__(self):
+        return len(self._sweeps)
+
+    def reset(self): # Drops every sweep, e.g. at the start of a new scene
+        self._sweeps = []
+        self._size = 0
+
+    def _reserve(self, num_points): # Grows the array so that it holds `num_points`
+        if num_points > len(self._buffer):
+            self._buffer = np.zeros((max(2 * len(self._buffer), num_points), self._buffer.shape[1]), dtype=np.float32)
+
+    def push(self,
+             points, # Points of the new sweep in its sensor frame, shape (N, >= num_point_feature)
+             timestamp, # Acquisition time of the sweep in seconds
+             pose=None # 4x4 sensor to world transform of the sweep, None if the sweeps share a frame
+             ): # Points of the fused frame, see `points`
+        # each sweep stays in its own frame and is moved from there on every frame, so no rounding error builds up
+        self._sweeps.insert(0, (np.array(points[:, :self.num_point_feature], dtype=np.float32), timestamp, pose))
+        del self._sweeps[self.nsweeps:] # Drop the oldest sweep
+
+        fused = [self._sweeps[0][0]] # The newest sweep is the key frame, kept whole as `load_pointcloud` does
+        for sweep, sweep_timestamp, sweep_pose in self._sweeps[1:]:
+            sweep = sweep.T.copy()
+            if pose is not None and sweep_pose is not None:
+                transform = np.linalg.inv(pose) @ sweep_pose # Sweep frame to the new one, the `transform_matrix` of the infos
+                sweep[:3, :] = transform.dot(np.vstack((sweep[:3, :], np.ones(sweep.shape[1]))))[:3, :]
+            fused.append(NuScenesDataset.remove_close(sweep, self.min_distance).T) # Remove points too close to the sensor
+
+        self._size = sum(len(sweep) for sweep in fused)
+        self._reserve(self._size)
+        start = 0
+        for sweep, (_, sweep_timestamp, _) in zip(fused, self._sweeps):
+            rows = self._buffer[start:start + len(sweep)]
+            rows[:, 1:-1] = sweep
+            rows[:, -1] = timestamp - sweep_timestamp # Time lag to the newest sweep
+            start += len(sweep)
+        self._buffer[:self._size, 0] = 0 # Batch id
+        return self.points
+
+    @property
+    def points(self): # View of the fused frame as `load_pointcloud` returns it, shape (N, num_point_feature + 1)
+        return self._buffer[:self._size, 1:]
+
+    def reader_input(self): # Tensor sharing memory with the fused frame, with the batch id column expected by the readers
+        return torch.from_numpy(self._buffer[:self._size])
+
+# %% ../../nbs/02_dataset.ipynb 41
+def _box_collisions(boxes # Boxes, shape (M, >= 7) with x, y, z, length, width, height first and yaw last
+                    ): # Bool array of shape (M, M), True where the bird's eye view footprints of two boxes overlap
+    """Separating axis test between the rotated footprints of every pair of boxes."""
+    cosa, sina = np.cos(boxes[:, -1]), np.sin(boxes[:, -1])
+    axes = np.stack([np.stack([cosa, sina], -1), np.stack([-sina, cosa], -1)], 1)  # Shape (M, 2, 2)
+    signs = np.array([[1, 1], [1, -1], [-1, -1], [-1, 1]], dtype=boxes.dtype)
+    corners = boxes[:, None, :2] + np.einsum('kc,mc,mad->mkd', signs, boxes[:, 3:5] / 2, axes)  # Shape (M, 4, 2)
+    projections = np.einsum('mkd,oad->omak', corners, axes)  # Corners of every box on the axes of every box
+    low, high = projections.min(-1), projections.max(-1)  # Shape (M, M, 2)
+    own = np.arange(len(boxes))
+    separated = ((high < low[own, own][:, None]) | (low > high[own, own][:, None])).any(-1)
+    return ~(separated | separated.T)
+
+# %% ../../nbs/02_dataset.ipynb 42
+class GTDatabaseSampler:
+    """
+    The `GTDatabaseSampler` class pastes objects of the ground-truth database written by
+    `NuScenesDataset.create_gt_database` into training frames. The points of every object live in one memory-mapped
+    array and the boxes, offsets and lengths in small NumPy arrays, so the database is not loaded into each worker and
+    sampling an object is an index lookup and a slice of the map.
+    """
+
+    def __init__(self,
+                 db_path, # Directory written by `NuScenesDataset.create_gt_database`
+                 sample_groups, # Number of objects of each class a frame should hold after sampling, e.g. {"car": 2, "pedestrian": 2}
+                 min_points=5, # Objects with fewer points are never sampled, a number or a dict with a number per class
+                 seed=None # Seed of the random generator, None for a random one
+                 ): # Ground-truth database sampler
+        self.db_path = Path(db_path)
+        with np.load(self.db_path / "index.npz") as index:
+            self.class_names = index["class_names"]
+            self.boxes = index["boxes"]  # Shape (K, 9), objects grouped by class
+            self.point_offsets = index["point_offsets"]  # First row of each object in `points`
+            self.point_counts = index["point_counts"]  # Number of rows of each object in `points`
+            self.num_point_features = int(index["num_point_features"])
+            class_offsets, class_counts = index["class_offsets"], index["class_counts"]
+        self.names = np.repeat(self.class_names, class_counts)  # Class name of each object
+        self.sample_groups = {name: num for name, num in sample_groups.items() if num > 0}
+        self._candidates = {}  # Class name -> objects that can be sampled
+        for name, start, count in zip(self.class_names.tolist(), class_offsets, class_counts):
+            threshold = min_points.get(name, 0) if isinstance(min_points, dict) else min_points
+            self._candidates[name] = start + np.flatnonzero(self.point_counts[start:start + count] >= threshold)
+        self.rng = np.random.default_rng(seed)
+        self._points = None
+
+    def __getstate__(self): # Workers started with spawn open the map themselves instead of receiving a copy of it
+        state = self.__dict__.copy()
+        state["_points"] = None
+        return state
+
+    def worker_init(self): # Gives each DataLoader worker its own map and random stream, derived from the torch seed of the worker
+        self._points = None
+        self.rng = np.random.default_rng(torch.initial_seed())
+
+    @property
+    def points(self): # Points of every object relative to its box center, memory-mapped on first use in each process
+        if self._points is None:
+            self._points = np.memmap(self.db_path / "points.bin", dtype=np.float32,
+                                     mode="r").reshape(-1, self.num_point_features)
+        return self._points
+
+    def sample_all(self,
+                   gt_boxes, # Boxes of the frame, shape (M, 9)
+                   gt_names # Class names of the boxes, shape (M,)
+                   ): # Dict with the names, boxes, points and masks of the sampled objects, None if nothing was sampled
+        picked, boxes = [], gt_boxes
+        for name, num in self.sample_groups.items():
+            candidates = self._candidates.get(name, np.zeros(0, dtype=np.int64))
+            num = min(num - int(np.sum(gt_names == name)), len(candidates))
+            if num <= 0:
+                continue
+            picks = candidates[self.rng.choice(len(candidates), num, replace=False)]
+            collisions = _box_collisions(np.concatenate([boxes, self.boxes[picks]]))
+            free = np.ones(len(collisions), dtype=bool)
+            for i in range(len(boxes), len(collisions)):  # Keep the candidates that do not overlap the boxes kept so far
+                free[i] = not collisions[i, :i][free[:i]].any()
+            picks = picks[free[len(boxes):]]
+            boxes = np.concatenate([boxes, self.boxes[picks]])
+            picked.append(picks)
+
+        picks = np.concatenate(picked) if picked else np.zeros(0, dtype=np.int64)
+        if len(picks) == 0:
+            return None
+        counts = self.point_counts[picks]
+        points = np.concatenate([self.points[offset:offset + count]
+                                 for offset, count in zip(self.point_offsets[picks], counts)])
+        points[:, :3] += np.repeat(self.boxes[picks, :3], counts, axis=0)  # Back to the position of the box
+        return {
+            "gt_names": self.names[picks],
+            "gt_boxes": self.boxes[picks],
+            "points": points,
+            "gt_masks": np.ones(len(picks), dtype=bool),
+        }
+
+# %% ../../nbs/02_dataset.ipynb 47
+class GlobalAffineAugmentation:
+    """
+    The `GlobalAffineAugmentation` class applies the global geometric augmentations of a frame (random flips, rotation
+    around the z axis, scaling and translation) as one affine transform. The augmentations are composed into a single
+    4x4 matrix, applied to the points in place in one pass, and to the centers, sizes, yaws and velocities of the boxes.
+    """
+
+    def __init__(self,
+                 rotation=(-np.pi / 4, np.pi / 4), # Range of the rotation around the z axis, in radians
+                 scaling=(0.95, 1.05), # Range of the scale factor
+                 flip_x=0.5, # Probability of flipping along the x axis (y -> -y)
+                 flip_y=0.5, # Probability of flipping along the y axis (x -> -x)
+                 translation_std=(0.0, 0.0, 0.0), # Standard deviation of the translation along x, y and z
+                 seed=None # Seed of the random generator, None for a random one
+                 ): # Global affine augmentation
+        assert rotation[0] <= rotation[1] and 0 < scaling[0] <= scaling[1], "Invalid rotation or scaling range"
+        self.rotation = rotation
+        self.scaling = scaling
+        self.flip_x = flip_x
+        self.flip_y = flip_y
+        self.translation_std = np.asarray(translation_std, dtype=np.float64)
+        self.rng = np.random.default_rng(seed)
+
+    def worker_init(self): # Gives each DataLoader worker its own random stream, derived from the torch seed of the worker
+        self.rng = np.random.default_rng(torch.initial_seed())
+
+    def sample(self): # Draws the 4x4 transform of a frame
+        # Every parameter is drawn on each call, so the stream does not depend on which augmentations are enabled
+        (flip_x, flip_y), angle, scale = self.rng.random(2), self.rng.uniform(*self.rotation), self.rng.uniform(*self.scaling)
+        translation = self.rng.normal(0.0, 1.0, 3) * self.translation_std
+        flip = np.diag([-1.0 if flip_y < self.flip_y else 1.0, -1.0 if flip_x < self.flip_x else 1.0, 1.0])
+        cosa, sina = np.cos(angle), np.sin(angle)
+        rotation = np.array([[cosa, -sina, 0.0], [sina, cosa, 0.0], [0.0, 0.0, 1.0]])
+        matrix = np.eye(4)
+        matrix[:3, :3] = scale * rotation @ flip  # Flip first, then rotate and scale
+        matrix[:3, 3] = translation
+        return matrix
+
+    @staticmethod
+    def transform_boxes(boxes, # Float array [M, 7] or [M, 9], x, y, z, length, width, height, (vx, vy,) yaw, updated in place
+                        matrix # Float array [4, 4], transform made of flips, a rotation around z, a scale and a translation
+                        ): # The boxes are overwritten
+        linear = matrix[:3, :3]
+        boxes[:, :3] = boxes[:, :3] @ linear.T + matrix[:3, 3]
+        boxes[:, 3:6] *= np.linalg.norm(linear[:, 0])  # The scale factor
+        heading = np.stack([np.cos(boxes[:, -1]), np.sin(boxes[:, -1])], -1) @ linear[:2, :2].T
+        boxes[:, -1] = np.arctan2(heading[:, 1], heading[:, 0])
+        if boxes.shape[1] == 9:
+            boxes[:, 6:8] = boxes[:, 6:8] @ linear[:2, :2].T
+
+    def __call__(self, res): # Augments the points and the ground-truth boxes of a sample
+        matrix = self.sample()
+        affine_points_jit(res["points"], matrix)
+        if "annotations" in res:
+            self.transform_boxes(res["annotations"]["gt_boxes"], matrix)
+        return res
+
+# %% ../../nbs/02_dataset.ipynb 51
+class BatchAffineAugmentation(GlobalAffineAugmentation):
+    """
+    The `BatchAffineAugmentation` class applies the global affine augmentations of `GlobalAffineAugmentation` to a
+    collated batch, in torch on the device of the batch, instead of to each sample in the DataLoader workers. One 4x4
+    transform is drawn per sample and applied to the points and boxes of that sample.
+    """
+
+    def sample_batch(self,
+                     batch_size:int, # Number of samples of the batch
+                     device=None # Device of the transforms
+                     ): # Transforms of the samples, float32 tensor [B, 4, 4]
+        # Drawn on the host with the stream of `GlobalAffineAugmentation`, a few numbers per sample
+        return torch.as_tensor(np.stack([self.sample() for _ in range(batch_size)]), dtype=torch.float32, device=device)
+
+    @staticmethod
+    def transform_points(points, # Float tensor [N, 1 + F], the batch index of each point then x, y, z, the samples one after the other as `collate` lays them out, updated in place
+                         matrices # Float tensor [B, 4, 4], transform of each sample
+                         ): # The points are overwritten
+        counts = torch.bincount(points[:, 0].long(), minlength=len(matrices)).tolist()
+        for xyz, matrix in zip(points[:, 1:4].split(counts), matrices):  # Views of the points of each sample
+            xyz.copy_(torch.addmm(matrix[:3, 3], xyz, matrix[:3, :3].T))
+
+    @staticmethod
+    def transform_box_tensor(boxes, # Float tensor [M, 7] or [M, 9], x, y, z, length, width, height, (vx, vy,) yaw, updated in place
+                             matrices # Float tensor [4, 4] or [M, 4, 4], transform of all the boxes or of each box
+                             ): # The boxes are overwritten, as `transform_boxes` does in numpy
+        linear = matrices[..., :3, :3].expand(len(boxes), 3, 3)
+        boxes[:, :3] = torch.einsum('mij,mj->mi', linear, boxes[:, :3]) + matrices[..., :3, 3]
+        boxes[:, 3:6] *= torch.linalg.norm(linear[:, :, 0], dim=-1, keepdim=True)  # The scale factor
+        heading = torch.einsum('mij,mj->mi', linear[:, :2, :2], torch.stack([torch.cos(boxes[:, -1]), torch.sin(boxes[:, -1])], -1))
+        boxes[:, -1] = torch.atan2(heading[:, 1], heading[:, 0])
+        if boxes.shape[1] == 9:
+            boxes[:, 6:8] = torch.einsum('mij,mj->mi', linear[:, :2, :2], boxes[:, 6:8])
+
+    @staticmethod
+    def keep_boxes(res): # `prepare_label` stage that hands the ground-truth boxes of a sample to `collate`, to be augmented with the batch
+        res["gt_boxes"] = res["annotations"]["gt_boxes"]
+        return res
+
+    def __call__(self, batch): # Augments the points and the ground-truth boxes of a collated batch, on their device
+        points = batch["points"]
+        matrices = self.sample_batch(batch["batch_size"], points.device)
+        self.transform_points(points, matrices)
+        for boxes, matrix in zip(batch.get("gt_boxes", []), matrices):  # One tensor of boxes per sample
+            self.transform_box_tensor(boxes, matrix)
+        batch["augmentation"] = matrices  # e.g. to map the predictions back to the frame of the sensor
+        return batch
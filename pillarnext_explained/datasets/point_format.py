@@ -0,0 +1,116 @@
+"""Compact quantized on-disk format of the point clouds"""
+
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../../nbs/10_point_format.ipynb.
+
+# %% auto 0
+__all__ = ['QUANTIZED_SUFFIX', 'quantize_points', 'dequantize_points', 'write_quantized', 'read_quantized', 'convert_point_files',
+           'convert_points_cli']
+
+# %% ../../nbs/10_point_format.ipynb 2
+import os
+from pathlib import Path
+import numpy as np
+from fastcore.script import call_parse
+
+# %% ../../nbs/10_point_format.ipynb 4
+_MAGIC = b"PNXQ"
+_VERSION = 1
+# Header of a quantized file, followed by the coordinates (int16 or int32, shape (N, 3)), the intensities (uint8, N)
+# and the ring indices (uint8, N)
+_HEADER = np.dtype([("magic", "S4"), ("version", "<u1"), ("coord_bytes", "<u1"), ("reserved", "<u2"),
+                    ("count", "<u4"), ("offset", "<f8", (3,)), ("resolution", "<f8")])
+
+# %% ../../nbs/10_point_format.ipynb 5
+QUANTIZED_SUFFIX = ".qbin" # Suffix of the quantized files, written next to the `.bin` files they are converted from
+
+# %% ../../nbs/10_point_format.ipynb 6
+def quantize_points(points: np.ndarray, # Float array [N, 5]: x, y, z, intensity and ring index, as in the nuScenes `.bin` files
+                    resolution: float = 0.004 # Step of the fixed-point coordinates in meters, the largest error is half of it
+                    ): # Bytes of the quantized file
+    """This function encodes a point cloud in the quantized format: the coordinates as int16 fixed-point values relative to the center of the cloud (int32 when its extent needs more than 16 bits), the intensities and the ring indices as uint8."""
+    assert points.ndim == 2 and points.shape[1] == 5, "Expected the 5 columns of a nuScenes point file"
+    coords = points[:, :3].astype(np.float64)
+    offset = (coords.min(0) + coords.max(0)) / 2 if len(points) else np.zeros(3)
+    steps = np.round((coords - offset) / resolution)
+    largest = np.abs(steps).max(initial=0)
+    assert largest <= np.iinfo(np.int32).max, "The extent of the cloud needs a coarser resolution"
+    coord_dtype = np.dtype("<i2") if largest <= np.iinfo(np.int16).max else np.dtype("<i4")
+    assert ((points[:, 3:] >= 0) & (points[:, 3:] <= 255)).all(), "The intensities and ring indices must be in [0, 255]"
+
+    header = np.zeros((), dtype=_HEADER)
+    header["magic"], header["version"], header["coord_bytes"] = _MAGIC, _VERSION, coord_dtype.itemsize
+    header["count"], header["offset"], header["resolution"] = len(points), offset, resolution
+    return b"".join([header.tobytes(), steps.astype(coord_dtype).tobytes(),
+                     np.round(points[:, 3]).astype(np.uint8).tobytes(), np.round(points[:, 4]).astype(np.uint8).tobytes()])
+
+# %% ../../nbs/10_point_format.ipynb 7
+def dequantize_points(data: bytes, # Bytes of a quantized file
+                      num_point_feature: int = 5 # Number of columns returned, out of x, y, z, intensity and ring index
+                      ): # Float32 array [N, num_point_feature], as `np.fromfile(path, np.float32).reshape(-1, 5)[:, :num_point_feature]`
+    """This function decodes the bytes written by `quantize_points`."""
+    header = np.frombuffer(data, dtype=_HEADER, count=1)[0]
+    assert header["magic"] == _MAGIC and header["version"] == _VERSION, "Not a quantized point file"
+    count, coord_bytes = int(header["count"]), int(header["coord_bytes"])
+    start = _HEADER.itemsize
+    steps = np.frombuffer(data, dtype=f"<i{coord_bytes}", count=3 * count, offset=start).reshape(count, 3)
+    start += 3 * count * coord_bytes
+
+    points = np.empty((count, num_point_feature), dtype=np.float32)
+    axes = min(num_point_feature, 3)
+    points[:, :axes] = steps[:, :axes] * header["resolution"] + header["offset"][:axes]
+    for column in range(3, num_point_feature):  # Intensity, then ring index
+        points[:, column] = np.frombuffer(data, dtype=np.uint8, count=count, offset=start + (column - 3) * count)
+    return points
+
+# %% ../../nbs/10_point_format.ipynb 8
+def write_quantized(path, # Path of the quantized file
+                    points: np.ndarray, # Float array [N, 5]: x, y, z, intensity and ring index
+                    resolution: float = 0.004 # Step of the fixed-point coordinates in meters
+                    ):
+    """This function writes a point cloud in the quantized format."""
+    with open(path, "wb") as f:
+        f.write(quantize_points(points, resolution))
+
+def read_quantized(path, # Path of a quantized file
+                   num_point_feature: int = 5 # Number of columns returned, out of x, y, z, intensity and ring index
+                   ): # Float32 array [N, num_point_feature]
+    """This function reads a point cloud written by `write_quantized`, with a single read of the file."""
+    with open(path, "rb") as f:
+        return dequantize_points(f.read(), num_point_feature)
+
+# %% ../../nbs/10_point_format.ipynb 10
+def convert_point_files(root, # Root of the dataset
+                        pattern: str = "**/*.bin", # Files converted, relative to `root`
+                        resolution: float = 0.004, # Step of the fixed-point coordinates in meters
+                        overwrite: bool = False # Whether existing quantized files are written again
+                        ): # Dict with the number of files, the bytes before and after and the largest coordinate error
+    """This function writes a quantized copy next to every point file of a dataset, checking each one against its source."""
+    report = {"files": 0, "bytes_in": 0, "bytes_out": 0, "max_error": 0.0}
+    for path in sorted(Path(root).glob(pattern)):
+        target = path.with_suffix(QUANTIZED_SUFFIX)
+        if target.exists() and not overwrite:
+            continue
+        points = np.fromfile(path, dtype=np.float32).reshape(-1, 5)
+        data = quantize_points(points, resolution)
+        decoded = dequantize_points(data)
+        error = float(np.abs(decoded[:, :3] - points[:, :3]).max(initial=0))
+        assert error <= resolution / 2 + 1e-4 and np.array_equal(decoded[:, 3:], np.round(points[:, 3:])), path
+        target.write_bytes(data)
+        report["files"] += 1
+        report["bytes_in"] += os.path.getsize(path)
+        report["bytes_out"] += len(data)
+        report["max_error"] = max(report["max_error"], error)
+    return report
+
+# %% ../../nbs/10_point_format.ipynb 11
+@call_parse
+def convert_points_cli(root:str, # Root of the dataset
+                       pattern:str='**/*.bin', # Files converted, relative to the root
+                       resolution:float=0.004, # Step of the fixed-point coordinates in meters
+                       overwrite:bool=False # Write the existing quantized files again
+                       ):
+    "Writes a quantized copy next to every point file of a dataset and reports the space saved."
+    report = convert_point_files(root, pattern, resolution, overwrite)
+    ratio = report['bytes_in'] / max(report['bytes_out'], 1)
+    print(f"{report['files']} files: {report['bytes_in'] / 2**20:.1f} MB -> {report['bytes_out'] / 2**20:.1f} MB "
+          f"({ratio:.2f}x smaller), largest coordinate error {1000 * report['max_error']:.2f} mm")
@@ -0,0 +1,170 @@
+"""Sequential sharded records of the dataset for streaming reads"""
+
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../../nbs/11_shards.ipynb.
+
+# %% auto 0
+__all__ = ['export_shards', 'ShardDataset']
+
+# %% ../../nbs/11_shards.ipynb 2
+import copy
+import json
+import os
+import pickle
+import numpy as np
+from torch.utils.data import IterableDataset, get_worker_info
+import torch.distributed as dist
+
+# %% ../../nbs/11_shards.ipynb 4
+def export_shards(dataset, # `NuScenesDataset` whose samples are exported, with its sweep settings
+                  out_dir, # Directory the shards and their index are written to
+                  samples_per_shard=256, # Number of samples in each shard file
+                  fused=True # Store the fused points of `load_pointcloud`, or the points of the key frame and of each sweep as read
+                  ): # Index of the shards, also written to `index.json`
+    """
+    This function packs the samples of a dataset into a few large shard files, written and read sequentially. Each
+    record holds the info entry of a sample and its points, so that reading a sample does not open any other file.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    index = {"fused": fused, "num_samples": 0, "num_records": 0, "shards": []}
+    # frames repeated by a resampling such as `cbgs` are written once, with the number of times they are read
+    repeats = {}
+    for info in dataset.infos:
+        repeats.setdefault(info["token"], [info, 0])[1] += 1
+    infos = list(repeats.values())
+    for start in range(0, len(infos), samples_per_shard):
+        name = f"shard-{len(index['shards']):05d}.bin"
+        offsets, sizes, counts = [], [], []
+        with open(os.path.join(out_dir, name), "wb") as f:
+            for info, count in infos[start:start + samples_per_shard]:
+                if fused:
+                    record = {"info": info, "points": dataset.load_pointcloud({}, info)["points"]}
+                else:
+                    record = {"info": info, "lidar_points": dataset.read_file(str(info["lidar_path"])),
+                              "sweep_points": [dataset.read_file(str(sweep["lidar_path"])) for sweep in info["sweeps"]]}
+                data = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+                offsets.append(f.tell())
+                sizes.append(len(data))
+                counts.append(count)
+                f.write(data)
+        index["shards"].append({"path": name, "offsets": offsets, "sizes": sizes, "repeats": counts})
+        index["num_samples"] += sum(counts)
+        index["num_records"] += len(offsets)
+    with open(os.path.join(out_dir, "index.json"), "w") as f:
+        json.dump(index, f)
+    return index
+
+# %% ../../nbs/11_shards.ipynb 6
+class ShardDataset(IterableDataset):
+    """
+    The `ShardDataset` class streams the samples of the shards written by `export_shards` through the pipelines of a
+    dataset. Every epoch the shards are shuffled, the stream of records is split evenly between the ranks and the
+    DataLoader workers, each of which reads its part sequentially, and the records go through a shuffle
+    buffer before being processed like `BaseDataset.__getitem__` processes an info entry.
+    """
+
+    def __init__(self,
+                 shard_dir, # Directory written by `export_shards`
+                 dataset, # Dataset whose pipelines (sampler, augmentation, labels) process the records, e.g. the exported one
+                 shuffle=True, # Shuffle the shards and the records each epoch
+                 buffer_size=16, # Number of records in the shuffle buffer of each worker (a fused 10-sweep record is ~7 MB), 1 disables it
+                 seed=0 # Seed of the shuffles, combined with the epoch
+                 ): # Sharded dataset
+        assert buffer_size > 0, "The shuffle buffer holds at least one record"
+        self.shard_dir = shard_dir
+        self.dataset = dataset
+        self.shuffle = shuffle
+        self.buffer_size = buffer_size
+        self.seed = seed
+        self.epoch = 0
+        self._epoch_set = False  # Whether `set_epoch` was called since the last iteration
+        self._iterated = False
+        with open(os.path.join(shard_dir, "index.json")) as f:
+            self.index = json.load(f)
+        # the ranks are read in the main process, the workers may not share its process group
+        self.rank, self.world_size = (dist.get_rank(), dist.get_world_size()) if dist.is_initialized() else (0, 1)
+
+    def __len__(self): # Samples this rank yields in an epoch, whatever the number of workers
+        return self.index["num_samples"] // self.world_size
+
+    def set_epoch(self, epoch): # Sets the epoch of the shuffles, as `DistributedSampler.set_epoch`
+        self.epoch = epoch
+        self._epoch_set = True
+
+    def worker_init(self): # Prepares the dataset of the pipelines in a DataLoader worker
+        self.dataset.worker_init()
+
+    def _segments(self, epoch, rank, worker, num_workers): # (shard, first, last record, copies of each) read by a worker of a rank in an epoch
+        shards = self.index["shards"]
+        order = np.arange(len(shards))
+        if self.shuffle:
+            np.random.default_rng([self.seed, epoch]).shuffle(order)  # The same order on every rank and worker
+        # each rank takes a contiguous and equally long part of the samples of the shuffled shards, a record counting
+        # as many samples as its repeats, and splits it between its workers without leaving any out
+        per_rank = self.index["num_samples"] // self.world_size
+        start = rank * per_rank + worker * per_rank // num_workers
+        stop = rank * per_rank + (worker + 1) * per_rank // num_workers
+        segments, position = [], 0
+        for shard in order:
+            ends = position + np.cumsum(shards[shard]["repeats"])
+            starts = ends - np.asarray(shards[shard]["repeats"])
+            copies = np.clip(np.minimum(ends, stop) - np.maximum(starts, start), 0, None)
+            read = np.flatnonzero(copies)
+            if len(read):
+                first, last = read[0], read[-1] + 1
+                segments.append((shard, first, last, copies[first:last].tolist()))
+            position = ends[-1]
+        return segments
+
+    def _records(self, segments): # Records of the segments and their number of copies, each segment read sequentially from a single seek
+        for shard, first, last, copies in segments:
+            shard = self.index["shards"][shard]
+            with open(os.path.join(self.shard_dir, shard["path"]), "rb") as f:
+                f.seek(shard["offsets"][first])
+                for size, count in zip(shard["sizes"][first:last], copies):  # The records of a shard are contiguous
+                    yield pickle.loads(f.read(size)), count
+
+    def _info(self, record): # Info entry of a record, carrying its points for `load_pointcloud`
+        info = dict(record["info"])
+        if "points" in record:
+            info["points"] = record["points"]
+        else:
+            info["lidar_points"] = record["lidar_points"]
+            info["sweeps"] = [dict(sweep, lidar_points=points)
+                              for sweep, points in zip(info["sweeps"], record["sweep_points"])]
+        return info
+
+    def __iter__(self):
+        worker = get_worker_info()
+        worker_id, num_workers = (worker.id, worker.num_workers) if worker is not None else (0, 1)
+        if self._iterated and not self._epoch_set:
+            self.epoch += 1  # e.g. persistent workers, whose copy of the dataset `set_epoch` does not reach
+        self._iterated, self._epoch_set = True, False
+        epoch = self.epoch
+        segments = self._segments(epoch, self.rank, worker_id, num_workers)
+
+        rng = np.random.default_rng([self.seed, epoch, self.rank * num_workers + worker_id])
+        remaining = {}  # Copies left of the repeated records, each copy but the last one is processed on a deep copy
+        def sample(record):
+            remaining[id(record)] -= 1
+            if remaining[id(record)] > 0:
+                record = copy.deepcopy(record)  # The pipelines modify the points in place
+            else:
+                del remaining[id(record)]
+            return self.dataset.get_sample(self._info(record))
+
+        buffer = []
+        for record, count in self._records(segments):
+            remaining[id(record)] = count
+            if not self.shuffle:
+                for _ in range(count):
+                    yield sample(record)
+                continue
+            for _ in range(count):
+                buffer.append(record)
+                if len(buffer) == self.buffer_size:  # Yield a random record of the full buffer
+                    i = rng.integers(len(buffer))
+                    buffer[i], buffer[-1] = buffer[-1], buffer[i]
+                    yield sample(buffer.pop())
+        rng.shuffle(buffer)
+        for record in buffer:
+            yield sample(record)
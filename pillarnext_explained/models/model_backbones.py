@@ -6,12 +6,12 @@ __all__ = ['SparseResNet', 'SparseResNet3D']
 # %% ../../nbs/06_model_backbones.ipynb 3
 import torch
 from torch import nn
+import torch.utils.checkpoint as cp
 import spconv
 import spconv.pytorch
 from spconv.pytorch import SparseSequential, SparseConv2d, SparseConv3d
 from .model_utils import SparseConvBlock, SparseBasicBlock, SparseConv3dBlock, SparseBasicBlock3d
 
-
 # %% ../../nbs/06_model_backbones.ipynb 5
 class SparseResNet(spconv.pytorch.SparseModule):
     """
@@ -24,7 +24,9 @@ class SparseResNet(spconv.pytorch.SparseModule):
             ds_num_filters: list, # Number of filters for each downsampling layer
             num_input_features: int, # Number of input features
             kernel_size: list = [3, 3, 3, 3], # Kernel sizes for each layer
-            out_channels: int = 256 # Number of output channels
+            out_channels: int = 256, # Number of output channels
+            sparse_output: bool = False, # Return the `SparseConvTensor` instead of densifying it
+            checkpointing: str = 'none' # Activation checkpointing policy: 'none', 'module' or 'stage'
             ):
 
         super(SparseResNet, self).__init__()  # Call the constructor of the parent class
@@ -32,6 +34,9 @@ class SparseResNet(spconv.pytorch.SparseModule):
         self._num_filters = ds_num_filters  # Store the number of filters for each layer
         self._layer_nums = layer_nums  # Store the number of blocks in each layer
         self._num_input_features = num_input_features  # Store the number of input features
+        self.sparse_output = sparse_output  # Whether to skip the final conversion to a dense tensor
+        assert checkpointing in ('none', 'module', 'stage')
+        self.checkpointing = checkpointing  # Which parts of the network are recomputed during backward
 
         # Ensure the lengths of the strides, filters, and layer numbers are consistent
         assert len(self._layer_strides) == len(self._layer_nums)
@@ -48,7 +53,8 @@ class SparseResNet(spconv.pytorch.SparseModule):
                 self._num_filters[i],
                 kernel_size[i],
                 self._layer_strides[i],
-                layer_num)
+                layer_num,
+                indice_key=f"subm{i}")
             blocks.append(block)  # Add the created block to the blocks list
 
         # Convert blocks list to a PyTorch ModuleList for proper handling in forward pass
@@ -56,13 +62,13 @@ class SparseResNet(spconv.pytorch.SparseModule):
 
         # Create the final mapping layer
         self.mapping = spconv.pytorch.SparseSequential(
-            spconv.SparseConv2d(self._num_filters[-1],
-                                out_channels, 1, 1, bias=False),  # 1x1 convolution
+            SparseConv2d(self._num_filters[-1],
+                         out_channels, 1, 1, bias=False),  # 1x1 convolution
             nn.BatchNorm1d(out_channels, eps=1e-3, momentum=0.01),  # Batch normalization
             nn.ReLU(),  # Activation function
         )
 
-    def _make_layer(self, inplanes, planes, kernel_size, stride, num_blocks):
+    def _make_layer(self, inplanes, planes, kernel_size, stride, num_blocks, indice_key=None):
         """
         Helper function to create a layer consisting of several blocks.
         """
@@ -71,33 +77,54 @@ class SparseResNet(spconv.pytorch.SparseModule):
         layers.append(SparseConvBlock(inplanes, planes,
                       kernel_size=kernel_size, stride=stride, use_subm=False))
 
-        # Add subsequent blocks without stride
+        # Add subsequent blocks without stride, all at one resolution, so they share one index map
         for j in range(num_blocks):
-            layers.append(SparseBasicBlock(planes, kernel_size=kernel_size))
+            layers.append(SparseBasicBlock(planes, kernel_size=kernel_size, indice_key=indice_key))
 
         # Return the layers as a SparseSequential module
         return spconv.pytorch.SparseSequential(*layers)
 
-    def forward(self, pillar_features, coors, input_shape):
+    def _forward(self, x):
+        """
+        Runs the blocks and the final mapping on a SparseConvTensor.
+        """
+        # Pass the tensor through each block sequentially, recomputing each stage in backward if requested
+        for i in range(len(self.blocks)):
+            if self.checkpointing == 'stage' and torch.is_grad_enabled():
+                x = cp.checkpoint(self.blocks[i], x, use_reentrant=False)
+            else:
+                x = self.blocks[i](x)
+
+        # Apply the final mapping
+        return self.mapping(x)
+
+    def forward(self,
+                pillar_features, # Features of each pillar, shape (M, C)
+                coors, # Pillar coordinates, shape (M, 3), format: batch_id, y, x
+                input_shape, # Spatial shape of the BEV grid
+                batch_size:int=None # Number of samples in the batch, as produced by `collate`
+                ):
         """
         Forward pass of the network.
         """
-        # Determine batch size from the unique coordinates
-        batch_size = len(torch.unique(coors[:, 0]))
+        if batch_size is None:
+            # Fall back to the largest batch index; this synchronizes with the device
+            batch_size = int(coors[:, 0].max()) + 1
         # Create a SparseConvTensor from the input features, coordinates, and shape
         x = spconv.pytorch.SparseConvTensor(
             pillar_features, coors, input_shape, batch_size)
-        
-        # Pass the tensor through each block sequentially
-        for i in range(len(self.blocks)):
-            x = self.blocks[i](x)
-        
-        # Apply the final mapping
-        x = self.mapping(x)
+
+        if self.checkpointing == 'module' and torch.is_grad_enabled():
+            x = cp.checkpoint(self._forward, x, use_reentrant=False)
+        else:
+            x = self._forward(x)
+        if self.sparse_output:
+            # Features, indices and spatial shape only; call `x.dense()` when a BEV map is needed
+            return x
         # Convert the sparse tensor to a dense tensor and return
         return x.dense()
 
-# %% ../../nbs/06_model_backbones.ipynb 8
+# %% ../../nbs/06_model_backbones.ipynb 11
 class SparseResNet3D(spconv.pytorch.SparseModule):
     """
     SparseResNet3D is a 3D variant of the SparseResNet model, designed for processing 3D sparse input data.
@@ -109,7 +136,8 @@ class SparseResNet3D(spconv.pytorch.SparseModule):
         ds_num_filters: list,  # Number of filters for each downsampling layer
         num_input_features: int,  # Number of input features
         kernel_size: list = [3, 3, 3, 3],  # Kernel sizes for each layer
-        out_channels: int = 128  # Number of output channels
+        out_channels: int = 128,  # Number of output channels
+        checkpointing: str = 'none'  # Activation checkpointing policy: 'none', 'module' or 'stage'
     ):
         super(SparseResNet3D, self).__init__()
         
@@ -118,6 +146,8 @@ class SparseResNet3D(spconv.pytorch.SparseModule):
         self._num_filters = ds_num_filters
         self._layer_nums = layer_nums
         self._num_input_features = num_input_features
+        assert checkpointing in ('none', 'module', 'stage')
+        self.checkpointing = checkpointing
 
         # Ensure the lengths of the lists match
         assert len(self._layer_strides) == len(self._layer_nums)
@@ -134,7 +164,8 @@ class SparseResNet3D(spconv.pytorch.SparseModule):
                 self._num_filters[i],
                 kernel_size[i],
                 self._layer_strides[i],
-                layer_num)
+                layer_num,
+                indice_key=f"subm{i}")
             blocks.append(block)
 
         # Store the blocks in a ModuleList
@@ -152,7 +183,7 @@ class SparseResNet3D(spconv.pytorch.SparseModule):
             nn.ReLU(),
         )
 
-    def _make_layer(self, inplanes, planes, kernel_size, stride, num_blocks):
+    def _make_layer(self, inplanes, planes, kernel_size, stride, num_blocks, indice_key=None):
         """
         Creates a single layer composed of sparse 3D convolution blocks.
         """
@@ -163,33 +194,51 @@ class SparseResNet3D(spconv.pytorch.SparseModule):
         layers.append(SparseConv3dBlock(inplanes, planes,
                       kernel_size=kernel_size, stride=stride, use_subm=False))
 
-        # Add the remaining blocks without downsampling
+        # Add the remaining blocks without downsampling, sharing one index map
         for _ in range(num_blocks):
-            layers.append(SparseBasicBlock3d(planes, kernel_size=kernel_size))
+            layers.append(SparseBasicBlock3d(planes, kernel_size=kernel_size, indice_key=indice_key))
 
         return spconv.pytorch.SparseSequential(*layers)
 
-    def forward(self, pillar_features, coors, input_shape):
-        # Get the batch size from the unique coordinates
-        batch_size = len(torch.unique(coors[:, 0]))
-        
-        # Create a sparse tensor
-        x = spconv.pytorch.SparseConvTensor(
-            pillar_features, coors, input_shape, batch_size)
-        
-        # Pass the tensor through the blocks
+    def _forward(self, x):
+        # Pass the tensor through the blocks, recomputing each stage in backward if requested
         for i in range(len(self.blocks)):
-            x = self.blocks[i](x)
-        
+            if self.checkpointing == 'stage' and torch.is_grad_enabled():
+                x = cp.checkpoint(self.blocks[i], x, use_reentrant=False)
+            else:
+                x = self.blocks[i](x)
+
         # Apply the extra convolution and mapping layers
         x = self.extra_conv(x)
-        x = self.mapping(x)
+        return self.mapping(x)
+
+    def forward(self,
+                pillar_features, # Features of each voxel, shape (M, C)
+                coors, # Voxel coordinates, shape (M, 4), format: batch_id, z, y, x
+                input_shape, # Spatial shape of the voxel grid
+                batch_size:int=None # Number of samples in the batch, as produced by `collate`
+                ):
+        if batch_size is None:
+            # Fall back to the largest batch index; this synchronizes with the device
+            batch_size = int(coors[:, 0].max()) + 1
         
-        # Convert the sparse tensor to a dense format
-        x = x.dense()
-        
-        # Reshape the output tensor
-        B, C, D, H, W = x.shape
-        x = x.view(B, C * D, H, W)
-        
-        return x
+        # Create a sparse tensor
+        x = spconv.pytorch.SparseConvTensor(
+            pillar_features, coors, input_shape, batch_size)
+
+        if self.checkpointing == 'module' and torch.is_grad_enabled():
+            x = cp.checkpoint(self._forward, x, use_reentrant=False)
+        else:
+            x = self._forward(x)
+
+        # Scatter the sparse features straight into the (B, C * D, H, W) BEV layout,
+        # without materializing the (B, C, D, H, W) volume that `x.dense()` would build
+        D, H, W = x.spatial_shape
+        C = x.features.shape[1]
+        bev = x.features.new_zeros(x.batch_size, C * D, H, W)
+        indices = x.indices.long()
+        # channel c of a voxel at depth d lands on BEV channel c * D + d
+        bev.view(x.batch_size, C, D, H, W)[
+            indices[:, 0], :, indices[:, 1], indices[:, 2], indices[:, 3]] = x.features
+
+        return bev
@@ -20,7 +20,9 @@ class ASPPNeck(nn.Module):
     output is then passed through a convolutional block to produce the final output.
     """
     def __init__(self,
-                 in_channels: int # Number of input channels
+                 in_channels: int, # Number of input channels
+                 fuse_branches: bool = False, # Accumulate the branches into the output instead of concatenating them
+                 checkpointing: str = 'module' # Activation checkpointing policy: 'none', 'module' or 'branch'
                  ):
 
         super(ASPPNeck, self).__init__()
@@ -30,9 +32,11 @@ class ASPPNeck(nn.Module):
             in_channels, in_channels, kernel_size=1, stride=1, bias=False, padding=0)
         self.weight = nn.Parameter(torch.randn(in_channels, in_channels, 3, 3))
         self.post_conv = ConvBlock(in_channels * 6, in_channels, kernel_size=1, stride=1)
+        self.fuse_branches = fuse_branches
+        assert checkpointing in ('none', 'module', 'branch')
+        self.checkpointing = checkpointing
 
-    def _forward(self, x):
-        x = self.pre_conv(x)
+    def _pyramid(self, x):
         branch1x1 = self.conv1x1(x)
         branch1 = F.conv2d(x, self.weight, stride=1,
                            bias=None, padding=1, dilation=1)
@@ -46,10 +50,50 @@ class ASPPNeck(nn.Module):
             torch.cat((x, branch1x1, branch1, branch6, branch12, branch18), dim=1))
         return x
 
-    def forward(self, x):
-        if x.requires_grad:
-            out = cp.checkpoint(self._forward, x)
+    def _pyramid_fused(self, x):
+        # split the 1x1 post_conv weight into one (C, C) slice per concatenated branch
+        post_weights = self.post_conv.conv.conv.weight.flatten(1).split(x.shape[1], dim=1)
+        # the identity and conv1x1 branches collapse into a single 1x1 convolution
+        weight = post_weights[0] + post_weights[1] @ self.conv1x1.weight.flatten(1)
+        out = F.conv2d(x, weight[:, :, None, None])
+        for post_weight, dilation in zip(post_weights[2:], (1, 6, 12, 18)):
+            # a 1x1 convolution after a 3x3 one is a 3x3 convolution with the composed weight
+            weight = torch.einsum('oc,cikl->oikl', post_weight, self.weight)
+            out += F.conv2d(x, weight, stride=1, bias=None, padding=dilation, dilation=dilation)
+        x = self.post_conv.act(self.post_conv.norm(out))
+        return x
+
+    def _branch(self, x, post_weight, dilation=None):
+        # one pyramid branch followed by its slice of the post_conv 1x1 weight
+        if dilation is None:
+            branch = self.conv1x1(x)
         else:
-            out = self._forward(x)
+            branch = F.conv2d(x, self.weight, stride=1, bias=None, padding=dilation, dilation=dilation)
+        return F.conv2d(branch, post_weight)
+
+    def _pyramid_per_branch(self, x):
+        post_weights = self.post_conv.conv.conv.weight.split(x.shape[1], dim=1)
+        out = F.conv2d(x, post_weights[0])
+        for post_weight, dilation in zip(post_weights[1:], (None, 1, 6, 12, 18)):
+            # only the shared input is kept for backward, the branch map is recomputed
+            out += cp.checkpoint(self._branch, x, post_weight, dilation, use_reentrant=False)
+        x = self.post_conv.act(self.post_conv.norm(out))
+        return x
+
+    def _forward(self, x):
+        x = self.pre_conv(x)
+        if self.fuse_branches:
+            return self._pyramid_fused(x)
+        return self._pyramid(x)
+
+    def forward(self, x):
+        if self.checkpointing == 'none' or not torch.is_grad_enabled():
+            return self._forward(x)
+        if self.checkpointing == 'module':
+            return cp.checkpoint(self._forward, x, use_reentrant=False)
 
-        return out
+        x = cp.checkpoint(self.pre_conv, x, use_reentrant=False)
+        if self.fuse_branches:
+            # the composed branches already keep nothing but their shared input
+            return self._pyramid_fused(x)
+        return self._pyramid_per_branch(x)
@@ -0,0 +1,160 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../../nbs/08_model_quantization.ipynb.
+
+# %% auto 0
+__all__ = ['quantize_dense', 'quantization_report']
+
+# %% ../../nbs/08_model_quantization.ipynb 3
+import copy
+import time
+import torch
+from torch import nn
+from torch.nn.modules.utils import _pair
+import torch.nn.functional as F
+from torch.ao.quantization import get_default_qconfig_mapping
+from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+from .model_utils import ConvBlock, BasicBlock, fuse_for_inference
+from .model_readers import PFNLayer, PointNet
+from .model_necks import ASPPNeck
+
+# %% ../../nbs/08_model_quantization.ipynb 4
+def _dense_targets(model):
+    "Names of the outermost dense submodules to quantize, only the linear of the PFN layers is dense."
+    targets = []
+    for name, module in model.named_modules():
+        if any(name == t or name.startswith(t + '.') for t in targets):
+            continue
+        if isinstance(module, (ASPPNeck, BasicBlock, ConvBlock)):
+            targets.append(name)
+        elif isinstance(module, (PFNLayer, PointNet)):
+            targets.append(f'{name}.linear' if name else 'linear')
+    return targets
+
+def _set_submodule(model, name, module):
+    "Replaces the submodule `name` of `model`, returning the new root if `name` is the model itself."
+    if name == '':
+        return module
+    parent, _, child = name.rpartition('.')
+    setattr(model.get_submodule(parent), child, module)
+    return model
+
+def _traceable(module):
+    """
+    Symbolically traces `module` with the functional convolutions written out positionally, the form the
+    int8 lowering expects (the ASPP branches call `F.conv2d` with integer strides and dilations).
+    """
+    with torch.no_grad():  # trace the inference path, without activation checkpointing
+        graph_module = torch.fx.symbolic_trace(module)
+    for node in graph_module.graph.nodes:
+        if node.op == 'call_function' and node.target is F.conv2d:
+            args = dict(zip(('input', 'weight', 'bias', 'stride', 'padding', 'dilation', 'groups'), node.args))
+            args.update(node.kwargs)
+            node.args = (args['input'], args['weight'], args.get('bias'), _pair(args.get('stride', 1)),
+                         _pair(args.get('padding', 0)), _pair(args.get('dilation', 1)), args.get('groups', 1))
+            node.kwargs = {}
+    graph_module.recompile()
+    return graph_module
+
+class _Bf16Autocast(nn.Module):
+    "Runs the wrapped module under bf16 autocast and hands an fp32 tensor back to the fp32 layers around it."
+    def __init__(self, module):
+        super(_Bf16Autocast, self).__init__()
+        self.module = module
+
+    def forward(self, x):
+        with torch.autocast(x.device.type, dtype=torch.bfloat16):
+            out = self.module(x)
+        return out.float()
+
+# %% ../../nbs/08_model_quantization.ipynb 5
+def quantize_dense(model:nn.Module, # fp32 model, or any module containing the dense blocks
+                   batches, # Iterable of calibration batches, e.g. a few hundred `NuScenesDataset` frames
+                   forward_fn, # Callable `forward_fn(model, batch)` running the model on one batch
+                   dtype:str='int8', # 'int8' for static post-training quantization, 'bf16' for autocast
+                   backend:str='x86' # Quantized engine used for int8: 'x86', 'fbgemm', 'onednn' or 'qnnpack'
+                   ): # A quantized copy of the model, the fp32 model is left untouched
+    """
+    Post-training quantization of the dense parts of a model for CPU inference: `ASPPNeck`, `BasicBlock`,
+    `ConvBlock` and the linears of `PFNLayer` and `PointNet`. Sparse `spconv` layers and the scatter
+    operations of the readers stay in fp32.
+
+    For int8 each dense block is traced with `torch.fx`, observed while `forward_fn` runs over `batches`,
+    and converted to quantized kernels (conv, batch norm and ReLU fused, per-channel weights). For bf16 the
+    blocks run under autocast and no calibration is needed.
+    """
+    assert dtype in ('int8', 'bf16')
+    model = copy.deepcopy(model).eval()
+    for module in model.modules():
+        if isinstance(module, (PFNLayer, PointNet)):
+            fuse_for_inference(module)  # the PFN batch norms sit between the linear and a functional ReLU
+    targets = _dense_targets(model)
+
+    if dtype == 'bf16':
+        for name in targets:
+            model = _set_submodule(model, name, _Bf16Autocast(model.get_submodule(name)))
+        return model
+
+    torch.backends.quantized.engine = backend
+    qconfig_mapping = get_default_qconfig_mapping(backend)
+    batches = iter(batches)
+    first = next(batches)
+
+    # the first batch gives the example inputs used to trace each block
+    examples = {}
+    hooks = [model.get_submodule(name).register_forward_pre_hook(
+                 lambda module, args, name=name: examples.setdefault(name, args)) for name in targets]
+    with torch.no_grad():
+        forward_fn(model, first)
+    for hook in hooks:
+        hook.remove()
+    targets = [name for name in targets if name in examples]  # blocks `forward_fn` never reaches stay fp32
+
+    with torch.no_grad():
+        for name in targets:
+            prepared = prepare_fx(_traceable(model.get_submodule(name)), qconfig_mapping, examples[name])
+            model = _set_submodule(model, name, prepared)
+        forward_fn(model, first)
+        for batch in batches:
+            forward_fn(model, batch)
+        for name in targets:
+            model = _set_submodule(model, name, convert_fx(model.get_submodule(name)))
+    return model
+
+# %% ../../nbs/08_model_quantization.ipynb 6
+def quantization_report(fp32_model:nn.Module, # Reference model
+                        quantized_model:nn.Module, # Model returned by `quantize_dense`
+                        batches, # Iterable of evaluation batches, ideally not the calibration ones
+                        forward_fn # Callable `forward_fn(model, batch)` returning the output tensor to compare
+                        ): # Dict with the accuracy delta and the CPU latency of both models
+    """
+    Compares the outputs of the quantized model against the fp32 one over `batches`: largest and mean
+    absolute error, error relative to the mean fp32 magnitude, and cosine similarity of the flattened
+    outputs, together with the mean time per batch of each model.
+    """
+    stats = {'max_abs_err': 0., 'abs_err': 0., 'abs_ref': 0., 'dot': 0., 'norm_ref': 0., 'norm_out': 0.,
+             'fp32_s': 0., 'quantized_s': 0., 'batches': 0}
+    with torch.no_grad():
+        for batch in batches:
+            start = time.perf_counter()
+            ref = forward_fn(fp32_model, batch).float()
+            stats['fp32_s'] += time.perf_counter() - start
+            start = time.perf_counter()
+            out = forward_fn(quantized_model, batch).float()
+            stats['quantized_s'] += time.perf_counter() - start
+
+            err = (out - ref).abs()
+            stats['max_abs_err'] = max(stats['max_abs_err'], err.max().item())
+            stats['abs_err'] += err.mean().item()
+            stats['abs_ref'] += ref.abs().mean().item()
+            stats['dot'] += (out * ref).sum().item()
+            stats['norm_ref'] += ref.pow(2).sum().item()
+            stats['norm_out'] += out.pow(2).sum().item()
+            stats['batches'] += 1
+
+    n = stats['batches']
+    return {'max_abs_err': stats['max_abs_err'],
+            'mean_abs_err': stats['abs_err'] / n,
+            'rel_err': stats['abs_err'] / stats['abs_ref'],
+            'cosine': stats['dot'] / (stats['norm_ref'] * stats['norm_out']) ** 0.5,
+            'fp32_ms': stats['fp32_s'] / n * 1e3,
+            'quantized_ms': stats['quantized_s'] / n * 1e3,
+            'speedup': stats['fp32_s'] / stats['quantized_s']}
@@ -5,17 +5,52 @@ __all__ = ['PFNLayer', 'PillarNet', 'PillarFeatureNet', 'DynamicVoxelEncoder', '
            'PillarVoxelNet', 'CylinderNet', 'SingleView', 'MVFFeatureNet']
 
 # %% ../../nbs/05_model_readers.ipynb 2
+import math
 import torch
 from torch import nn
 from torch.nn import functional as F
 import numpy as np
-import torch_scatter
-from functools import reduce
 import spconv
 import spconv.pytorch
 from .model_utils import SparseConvBlock, SparseBasicBlock
 
-# %% ../../nbs/05_model_readers.ipynb 5
+# %% ../../nbs/05_model_readers.ipynb 4
+def _grid_size(voxel_size, pc_range):
+    "Number of voxels along each axis of `pc_range`, as plain ints so that traced graphs see constants."
+    grid_size = (np.array(pc_range[3:]) - np.array(pc_range[:3])) / np.array(voxel_size)
+    return [int(size) for size in np.round(grid_size)]
+
+def _scatter_max(src, index, dim_size=None):
+    "Row-wise maximum of `src` per `index`, the native counterpart of `torch_scatter.scatter_max(...)[0]`."
+    if dim_size is None:
+        dim_size = int(index.max()) + 1 if index.numel() > 0 else 0
+    out = src.new_zeros((dim_size, src.shape[1]))
+    return out.scatter_reduce_(0, index.unsqueeze(1).expand_as(src), src, 'amax', include_self=False)
+
+def _scatter_mean(src, index, dim_size=None):
+    "Row-wise mean of `src` per `index`, the native counterpart of `torch_scatter.scatter_mean`."
+    if dim_size is None:
+        dim_size = int(index.max()) + 1 if index.numel() > 0 else 0
+    total = src.new_zeros((dim_size, src.shape[1])).index_add_(0, index, src)
+    count = src.new_zeros(dim_size).index_add_(0, index, src.new_ones(src.shape[0]))
+    return total / count.clamp(min=1).unsqueeze(1)
+
+def _linear_keys(batch_idx, coords, grid_size):
+    "Packs the batch id and the voxel coordinates of each point into one int64, ordered as the rows (batch_id, x, y, ...)."
+    keys = batch_idx
+    for axis in range(coords.shape[1]):
+        keys = keys * grid_size[axis] + coords[:, axis]
+    return keys
+
+def _unpack_keys(keys, grid_size):
+    "Rows (batch_id, x, y, ...) of the keys built by `_linear_keys`."
+    columns = []
+    for size in reversed(grid_size):
+        columns.append(keys % size)
+        keys = keys // size
+    return torch.stack([keys] + columns[::-1], dim=1)
+
+# %% ../../nbs/05_model_readers.ipynb 6
 class PFNLayer(nn.Module):
     """
     Pillar Feature Net Layer.
@@ -45,7 +80,7 @@ class PFNLayer(nn.Module):
         torch.backends.cudnn.enabled = True  # Re-enable cuDNN
 
         # max pooling
-        feat_max = torch_scatter.scatter_max(x, unq_inv, dim=0)[0]  # Perform scatter max pooling
+        feat_max = _scatter_max(x, unq_inv)  # Perform scatter max pooling
         x_max = feat_max[unq_inv]  # Gather the max features for each point
 
         if self.last_vfe:
@@ -54,7 +89,7 @@ class PFNLayer(nn.Module):
             x_concatenated = torch.cat([x, x_max], dim=1)  # Otherwise, concatenate the original and max features
             return x_concatenated  # Return the concatenated features
 
-# %% ../../nbs/05_model_readers.ipynb 8
+# %% ../../nbs/05_model_readers.ipynb 9
 class PillarNet(nn.Module):
     """
     PillarNet.
@@ -72,45 +107,43 @@ class PillarNet(nn.Module):
                  pc_range: list, # A list defining the range of the point cloud data in the x and y dimensions. This is used to filter and normalize the point cloud data. Only utilize x and y min
                  ):
         super().__init__()
-        self.voxel_size = np.array(voxel_size)
-        self.pc_range = np.array(pc_range)
+        # static configuration: buffers follow the module across devices, the grid size is a constant
+        self.register_buffer('voxel_size', torch.tensor(voxel_size, dtype=torch.float32), persistent=False)
+        self.register_buffer('pc_range', torch.tensor(pc_range, dtype=torch.float32), persistent=False)
+        self.grid_size = _grid_size(voxel_size, pc_range)  # x, y, z
 
     def forward(self,
                 points: torch.Tensor # Points in LiDAR coordinate, shape: (N, d), format: batch_id, x, y, z, feat1, ...
                 ):
 
-        device = points.device
         dtype = points.dtype
 
         # discard out of range points
-        grid_size = (self.pc_range[3:] - self.pc_range[:3]
-                     )/self.voxel_size  # x,  y, z
-        grid_size = np.round(grid_size, 0, grid_size).astype(np.int64)
-
-        voxel_size = torch.from_numpy(
-            self.voxel_size).type_as(points).to(device)
-        pc_range = torch.from_numpy(self.pc_range).type_as(points).to(device)
+        grid_size = self.grid_size
+        voxel_size = self.voxel_size.type_as(points)
+        pc_range = self.pc_range.type_as(points)
 
         points_coords = (
             points[:, 1:4] - pc_range[:3].view(-1, 3)) / voxel_size.view(-1, 3)   # x, y, z
 
-        mask = reduce(torch.logical_and, (points_coords[:, 0] >= 0,
-                                          points_coords[:, 0] < grid_size[0],
-                                          points_coords[:, 1] >= 0,
-                                          points_coords[:, 1] < grid_size[1]))
+        mask = ((points_coords[:, 0] >= 0) & (points_coords[:, 0] < grid_size[0]) &
+                (points_coords[:, 1] >= 0) & (points_coords[:, 1] < grid_size[1]))
 
         points = points[mask]
         points_coords = points_coords[mask]
+        if torch.compiler.is_compiling():
+            # let the traced graph size the per-point layers that follow (eager still accepts an empty crop)
+            torch._check(points.shape[0] > 0)
 
         points_coords = points_coords.long()
-        batch_idx = points[:, 0:1].long()
+        batch_idx = points[:, 0].long()
 
-        points_index = torch.cat((batch_idx, points_coords[:, :2]), dim=1)
-        unq, unq_inv = torch.unique(points_index, return_inverse=True, dim=0)
-        unq = unq.int()
+        # one int64 key per point: sorting the keys sorts the pillars by batch_id, x, y, as a row-wise unique would,
+        # without the row-by-row comparisons of torch.unique(dim=0)
+        unq_keys, unq_inv = torch.unique(_linear_keys(batch_idx, points_coords[:, :2], grid_size[:2]), return_inverse=True)
+        unq = _unpack_keys(unq_keys, grid_size[:2]).int()
 
-        points_mean_scatter = torch_scatter.scatter_mean(
-            points[:, 1:4], unq_inv, dim=0)
+        points_mean_scatter = _scatter_mean(points[:, 1:4], unq_inv, unq.shape[0])
 
         f_cluster = points[:, 1:4] - points_mean_scatter[unq_inv]
 
@@ -121,9 +154,9 @@ class PillarNet(nn.Module):
         # Combine together feature decorations
         features = torch.cat([points[:, 1:], f_cluster, f_center], dim=-1)
 
-        return features, unq[:, [0, 2, 1]], unq_inv, grid_size[[1, 0]]
+        return features, unq[:, [0, 2, 1]], unq_inv, [grid_size[1], grid_size[0]]
 
-# %% ../../nbs/05_model_readers.ipynb 11
+# %% ../../nbs/05_model_readers.ipynb 12
 class PillarFeatureNet(nn.Module):
     """
     Pillar Feature Net.
@@ -162,9 +195,6 @@ class PillarFeatureNet(nn.Module):
 
         self.feature_output_dim = num_filters[-1]
 
-        self.voxel_size = np.array(voxel_size)
-        self.pc_range = np.array(pc_range)
-
         self.voxelization = PillarNet(num_input_features, voxel_size, pc_range)
 
     def forward(self, points):
@@ -173,11 +203,11 @@ class PillarFeatureNet(nn.Module):
         for pfn in self.pfn_layers:
             features = pfn(features, unq_inv)  # num_points, dim_feat
 
-        feat_max = torch_scatter.scatter_max(features, unq_inv, dim=0)[0]
+        feat_max = _scatter_max(features, unq_inv, coords.shape[0])
 
         return feat_max, coords, grid_size
 
-# %% ../../nbs/05_model_readers.ipynb 17
+# %% ../../nbs/05_model_readers.ipynb 18
 class DynamicVoxelEncoder(nn.Module):
     """
     Dynamic version of VoxelFeatureExtractorV3
@@ -186,12 +216,13 @@ class DynamicVoxelEncoder(nn.Module):
     def __init__(self):
         super(DynamicVoxelEncoder, self).__init__()
 
-    def forward(self, inputs, unq_inv):
-        features = torch_scatter.scatter_mean(inputs, unq_inv, dim=0)
+    def forward(self, inputs, unq_inv, num_voxels=None):
+        # the number of voxels is known by the caller, passing it avoids reading it back from the indices
+        features = _scatter_mean(inputs, unq_inv, num_voxels)
 
         return features
 
-# %% ../../nbs/05_model_readers.ipynb 19
+# %% ../../nbs/05_model_readers.ipynb 20
 class VoxelNet(nn.Module):
     """
     Dynamic voxelization for point clouds
@@ -205,48 +236,41 @@ class VoxelNet(nn.Module):
                 pc_range # The range of the point cloud. It's a 6-element list or array that specifies the minimum and maximum bounds in the x, y, and z dimensions.
                 ):
         super().__init__()
-        self.voxel_size = np.array(voxel_size)
-        self.pc_range = np.array(pc_range)
+        self.register_buffer('voxel_size', torch.tensor(voxel_size, dtype=torch.float32), persistent=False)
+        self.register_buffer('pc_range', torch.tensor(pc_range, dtype=torch.float32), persistent=False)
+        self.grid_size = _grid_size(voxel_size, pc_range)  # voxel range of x, y, z
 
     def forward(self, points):
         """
         points: Tensor: (N, d), batch_id, x, y, z, ...
         """
-        device = points.device
-
-        # voxel range of x, y, z
-        grid_size = (self.pc_range[3:] - self.pc_range[:3]) / self.voxel_size
-        grid_size = np.round(grid_size, 0, grid_size).astype(np.int64)
-
-        voxel_size = torch.from_numpy(
-            self.voxel_size).type_as(points).to(device)
-        pc_range = torch.from_numpy(self.pc_range).type_as(points).to(device)
+        grid_size = self.grid_size
+        voxel_size = self.voxel_size.type_as(points)
+        pc_range = self.pc_range.type_as(points)
 
         points_coords = (
             points[:, 1:4] - pc_range[:3].view(-1, 3)) / voxel_size.view(-1, 3)  # x, y, z
 
-        mask = reduce(torch.logical_and, (points_coords[:, 0] >= 0,
-                                          points_coords[:, 0] < grid_size[0],
-                                          points_coords[:, 1] >= 0,
-                                          points_coords[:, 1] < grid_size[1],
-                                          points_coords[:, 2] >= 0,
-                                          points_coords[:, 2] < grid_size[2]))  # remove the points out of range
+        # remove the points out of range
+        mask = ((points_coords[:, 0] >= 0) & (points_coords[:, 0] < grid_size[0]) &
+                (points_coords[:, 1] >= 0) & (points_coords[:, 1] < grid_size[1]) &
+                (points_coords[:, 2] >= 0) & (points_coords[:, 2] < grid_size[2]))
 
         points = points[mask]
         points_coords = points_coords[mask]
 
         points_coords = points_coords.long()
-        batch_idx = points[:, 0:1].long()
-        point_index = torch.cat((batch_idx, points_coords), dim=1)
+        batch_idx = points[:, 0].long()
 
-        unq, unq_inv = torch.unique(point_index, return_inverse=True, dim=0)
-        unq = unq.int()
+        # one int64 key per point, sorted as the rows batch_id, x, y, z (see `PillarNet`)
+        unq_keys, unq_inv = torch.unique(_linear_keys(batch_idx, points_coords, grid_size), return_inverse=True)
+        unq = _unpack_keys(unq_keys, grid_size).int()
 
         features = points[:, 1:]
 
-        return features, unq[:, [0, 3, 2, 1]], unq_inv, grid_size[[2, 1, 0]]
+        return features, unq[:, [0, 3, 2, 1]], unq_inv, [grid_size[2], grid_size[1], grid_size[0]]
 
-# %% ../../nbs/05_model_readers.ipynb 22
+# %% ../../nbs/05_model_readers.ipynb 26
 class VoxelFeatureNet(nn.Module):
     """
     This class performs dynamic voxelization of point clouds and then encodes the voxel features using DynamicVoxelEncoder.
@@ -263,11 +287,11 @@ class VoxelFeatureNet(nn.Module):
     def forward(self, points):
         features, coords, unq_inv, grid_size = self.voxelization(points)
 
-        features = self.voxel_encoder(features, unq_inv)
+        features = self.voxel_encoder(features, unq_inv, coords.shape[0])
 
         return features, coords, grid_size
 
-# %% ../../nbs/05_model_readers.ipynb 28
+# %% ../../nbs/05_model_readers.ipynb 32
 class PointNet(nn.Module):
     """
     Linear Process for point feature
@@ -290,7 +314,7 @@ class PointNet(nn.Module):
 
         return x
 
-# %% ../../nbs/05_model_readers.ipynb 30
+# %% ../../nbs/05_model_readers.ipynb 34
 class PillarVoxelNet(nn.Module):
     """
     This class implements the voxelization process, converting point clouds into voxel grid indices and computing features for each point relative to the voxel grid.
@@ -300,20 +324,16 @@ class PillarVoxelNet(nn.Module):
                 pc_range # Point cloud range. Only utilize x and y min.
                 ):
         super().__init__()
-        self.voxel_size = np.array(voxel_size)
-        self.pc_range = np.array(pc_range)
+        self.register_buffer('voxel_size', torch.tensor(voxel_size, dtype=torch.float32), persistent=False)
+        self.register_buffer('pc_range', torch.tensor(pc_range, dtype=torch.float32), persistent=False)
+        self.grid_size = _grid_size(voxel_size, pc_range)  # x, y, z
 
     def forward(self, points):
-        device = points.device
         dtype = points.dtype
 
-        grid_size = (self.pc_range[3:] - self.pc_range[:3]
-                     )/self.voxel_size  # x,  y, z
-        grid_size = np.round(grid_size, 0, grid_size).astype(np.int64)
-
-        voxel_size = torch.from_numpy(
-            self.voxel_size).type_as(points).to(device)
-        pc_range = torch.from_numpy(self.pc_range).type_as(points).to(device)
+        grid_size = self.grid_size
+        voxel_size = self.voxel_size.type_as(points)
+        pc_range = self.pc_range.type_as(points)
 
         points_coords = (
             points[:, 1:4] - pc_range[:3].view(-1, 3)) / voxel_size.view(-1, 3)   # x, y, z
@@ -331,8 +351,7 @@ class PillarVoxelNet(nn.Module):
         unq, unq_inv = torch.unique(points_index, return_inverse=True, dim=0)
         unq = unq.int()        # breakpoint()
 
-        points_mean_scatter = torch_scatter.scatter_mean(
-            points[:, 1:4], unq_inv, dim=0)
+        points_mean_scatter = _scatter_mean(points[:, 1:4], unq_inv, unq.shape[0])
 
         f_cluster = points[:, 1:4] - points_mean_scatter[unq_inv]
 
@@ -343,36 +362,32 @@ class PillarVoxelNet(nn.Module):
         # Combine together feature decorations
         features = torch.cat([points[:, 1:], f_cluster, f_center], dim=-1)
 
-        return features, unq[:, [0, 2, 1]], unq_inv, grid_size[[1, 0]]
+        return features, unq[:, [0, 2, 1]], unq_inv, [grid_size[1], grid_size[0]]
 
-# %% ../../nbs/05_model_readers.ipynb 34
+# %% ../../nbs/05_model_readers.ipynb 38
 class CylinderNet(nn.Module):
     def __init__(self,
                 voxel_size, # Size of each voxel, only utilize x and y size
                 pc_range # Point cloud range, only utilize x and y min
                 ):
         super().__init__()
-        self.voxel_size = np.array(voxel_size)
-        self.pc_range = np.array(pc_range)
+        self.register_buffer('voxel_size', torch.tensor(voxel_size, dtype=torch.float32), persistent=False)
+        self.register_buffer('pc_range', torch.tensor(pc_range, dtype=torch.float32), persistent=False)
+        self.grid_size = _grid_size(voxel_size, pc_range)  # phi, z, rho
 
     def forward(self, points):
-        device = points.device
         dtype = points.dtype
         points_x = points[:, 1:2]
         points_y = points[:, 2:3]
         points_z = points[:, 3:4]
-        points_phi = torch.atan2(points_y, points_x) / np.pi * 180
+        points_phi = torch.atan2(points_y, points_x) / math.pi * 180
         points_rho = torch.sqrt(points_x ** 2 + points_y ** 2)
         points_cylinder = torch.cat(
             (points[:, 0:1], points_phi, points_z, points_rho, points[:, 4:]), dim=-1)
 
-        grid_size = (self.pc_range[3:] - self.pc_range[:3]
-                     )/self.voxel_size  # phi, z, rho
-        grid_size = np.round(grid_size, 0, grid_size).astype(np.int64)
-
-        voxel_size = torch.from_numpy(
-            self.voxel_size).type_as(points).to(device)
-        pc_range = torch.from_numpy(self.pc_range).type_as(points).to(device)
+        grid_size = self.grid_size
+        voxel_size = self.voxel_size.type_as(points)
+        pc_range = self.pc_range.type_as(points)
 
         points_coords = (
             points_cylinder[:, 1:4] - pc_range[:3].view(-1, 3)) / voxel_size.view(-1, 3)
@@ -389,8 +404,7 @@ class CylinderNet(nn.Module):
         unq, unq_inv = torch.unique(points_index, return_inverse=True, dim=0)
         unq = unq.int()
 
-        points_mean_scatter = torch_scatter.scatter_mean(
-            points_cylinder[:, 1:4], unq_inv, dim=0)
+        points_mean_scatter = _scatter_mean(points_cylinder[:, 1:4], unq_inv, unq.shape[0])
         f_cluster = points_cylinder[:, 1:4] - points_mean_scatter[unq_inv]
 
         # Find distance of x, y, and z from pillar center
@@ -401,9 +415,9 @@ class CylinderNet(nn.Module):
         features = torch.cat(
             [points_cylinder[:, 1:], f_cluster, f_center], dim=-1)
 
-        return features, unq[:, [0, 2, 1]], unq_inv, grid_size[[1, 0]]
+        return features, unq[:, [0, 2, 1]], unq_inv, [grid_size[1], grid_size[0]]
 
-# %% ../../nbs/05_model_readers.ipynb 36
+# %% ../../nbs/05_model_readers.ipynb 40
 class SingleView(nn.Module):
     """
     authoured by Beijing-jinyu
@@ -425,8 +439,8 @@ class SingleView(nn.Module):
                  ):
         super().__init__()
         self.mode = mode
-        self.voxel_size = np.array(voxel_size[:2])
-        self.bias = np.array(pc_range[:2])
+        self.register_buffer('voxel_size', torch.tensor(voxel_size[:2], dtype=torch.float32), persistent=False)
+        self.register_buffer('bias', torch.tensor(pc_range[:2], dtype=torch.float32), persistent=False)
         num_filters = [in_channels] + list(num_filters)
         pfn_layers = []
         for i in range(len(num_filters) - 1):
@@ -450,36 +464,36 @@ class SingleView(nn.Module):
                 ds_num_filters[i],
                 kernel_size[i],
                 ds_layer_strides[i],
-                layer_num)
+                layer_num,
+                indice_key=f"subm{i}")
             blocks.append(block)
 
         self.blocks = nn.ModuleList(blocks)
-        self.ds_rate = np.prod(np.array(ds_layer_strides))
+        self.ds_rate = int(np.prod(ds_layer_strides))
 
-    def _make_layer(self, inplanes, planes, kernel_size, stride, num_blocks):
+    def _make_layer(self, inplanes, planes, kernel_size, stride, num_blocks, indice_key=None):
 
         layers = []
         layers.append(SparseConvBlock(inplanes, planes,
                       kernel_size=kernel_size, stride=stride, use_subm=False))
 
         for j in range(num_blocks):
-            layers.append(SparseBasicBlock(planes, kernel_size=kernel_size))
+            layers.append(SparseBasicBlock(planes, kernel_size=kernel_size, indice_key=indice_key))  # One index map per stage
 
         return spconv.pytorch.SparseSequential(*layers)
 
-    def forward(self, features, unq, unq_inv, grid_size):
+    def forward(self, features, unq, unq_inv, grid_size, batch_size=None):
         feature_pos = features[:,
                                0:2] if self.mode == 'pillar' else features[:, 10:12]
-        device = feature_pos.device
-        voxel_size = torch.from_numpy(
-            self.voxel_size).type_as(feature_pos).to(device)
-        bias = torch.from_numpy(self.bias).type_as(feature_pos).to(device)
+        voxel_size = self.voxel_size.type_as(feature_pos)
+        bias = self.bias.type_as(feature_pos)
         feature_pos = (feature_pos - bias) / voxel_size
 
         for pfn in self.pfn_layers:
             features = pfn(features, unq_inv)  # num_points, dim_feat
-        features_voxel = torch_scatter.scatter_max(features, unq_inv, dim=0)[0]
-        batch_size = len(torch.unique(unq[:, 0]))
+        features_voxel = _scatter_max(features, unq_inv, unq.shape[0])
+        if batch_size is None:
+            batch_size = int(unq[:, 0].max()) + 1
         x = spconv.pytorch.SparseConvTensor(
             features_voxel, unq, grid_size, batch_size)
 
@@ -529,7 +543,7 @@ class SingleView(nn.Module):
 
         return features
 
-# %% ../../nbs/05_model_readers.ipynb 39
+# %% ../../nbs/05_model_readers.ipynb 43
 class MVFFeatureNet(nn.Module):
     """
     authoured by Beijing-jinyu
@@ -551,7 +565,7 @@ class MVFFeatureNet(nn.Module):
         super().__init__()
         self.in_channels = in_channels
         self.voxel_size = voxel_size
-        self.pc_range = pc_range
+        self.register_buffer('pc_range', torch.tensor(pc_range, dtype=torch.float32), persistent=False)
         self.cylinder_range = cylinder_range
         self.cylinder_size = cylinder_size
 
@@ -559,23 +573,23 @@ class MVFFeatureNet(nn.Module):
         self.cylinderlization = CylinderNet(cylinder_size, cylinder_range)
 
         self.pillarview = SingleView((in_channels + 5) * 2, num_filters, layer_nums, ds_layer_strides,
-                                     ds_num_filters, kernel_size, 'pillar', self.voxel_size, self.pc_range)
+                                     ds_num_filters, kernel_size, 'pillar', self.voxel_size, pc_range)
         self.cylinderview = SingleView((in_channels + 5) * 2, num_filters, layer_nums, ds_layer_strides,
                                        ds_num_filters, kernel_size, 'cylinder', self.cylinder_size, self.cylinder_range)
-        self.ds_rate = np.prod(np.array(ds_layer_strides))
+        self.ds_rate = int(np.prod(ds_layer_strides))
 
         self.pointnet1 = PointNet((in_channels + 5) * 2, ds_num_filters[-1])
         self.pointnet2 = PointNet(ds_num_filters[-1] * 3, out_channels)
 
-    def forward(self, points):
-        dtype = points.dtype
-        pc_range = torch.tensor(self.pc_range, dtype=dtype)
-        mask = reduce(torch.logical_and, (points[:, 1] >= pc_range[0],
-                                          points[:, 1] < pc_range[3],
-                                          points[:, 2] >= pc_range[1],
-                                          points[:, 2] < pc_range[4],
-                                          points[:, 3] >= pc_range[2],
-                                          points[:, 3] < pc_range[5]))
+    def _point_features(self, points):
+        """
+        Crops the points and decorates them in the pillar and cylinder views, the dense part of the reader that
+        `torch.compile` captures as a single graph (the sparse convolutions of the views run in `spconv`).
+        """
+        pc_range = self.pc_range.type_as(points)
+        mask = ((points[:, 1] >= pc_range[0]) & (points[:, 1] < pc_range[3]) &
+                (points[:, 2] >= pc_range[1]) & (points[:, 2] < pc_range[4]) &
+                (points[:, 3] >= pc_range[2]) & (points[:, 3] < pc_range[5]))
         points = points[mask]
 
         pillar_feature, pillar_coords, pillar_inv, pillar_size = self.voxelization(
@@ -583,21 +597,28 @@ class MVFFeatureNet(nn.Module):
         cylinder_feature, cylinder_coords, cylinder_inv, cylinder_size = self.cylinderlization(
             points)
         points_feature = torch.cat((pillar_feature, cylinder_feature), dim=-1)
+        return (points_feature, pillar_coords, pillar_inv, pillar_size,
+                cylinder_coords, cylinder_inv, cylinder_size)
+
+    def forward(self, points, batch_size=None):
+        if batch_size is None:
+            # counted before cropping so that samples without points in range keep their slot
+            batch_size = int(points[:, 0].max()) + 1
+        (points_feature, pillar_coords, pillar_inv, pillar_size,
+         cylinder_coords, cylinder_inv, cylinder_size) = self._point_features(points)
 
         pillar_view = self.pillarview(
-            points_feature, pillar_coords, pillar_inv, pillar_size)
+            points_feature, pillar_coords, pillar_inv, pillar_size, batch_size)
         cylinder_view = self.cylinderview(
-            points_feature, cylinder_coords, cylinder_inv, cylinder_size)
+            points_feature, cylinder_coords, cylinder_inv, cylinder_size, batch_size)
 
         points_feature = self.pointnet1(points_feature)
         points_feature = torch.cat(
             (points_feature, pillar_view, cylinder_view), dim=-1)
         pillar_feature = self.pointnet2(points_feature)
-        pillar_feature = torch_scatter.scatter_max(
-            pillar_feature, pillar_inv, dim=0)[0]
-        batch_size = len(torch.unique(pillar_coords[:, 0]))
+        pillar_feature = _scatter_max(pillar_feature, pillar_inv, pillar_coords.shape[0])
         pillar_coords[:, 1:] = pillar_coords[:, 1:] // self.ds_rate
-        pillar_size = pillar_size // self.ds_rate
+        pillar_size = [size // self.ds_rate for size in pillar_size]
         x = spconv.pytorch.SparseConvTensor(
             pillar_feature, pillar_coords, pillar_size, batch_size)
         return x.dense()
@@ -2,13 +2,18 @@
 
 # %% auto 0
 __all__ = ['Conv', 'ConvBlock', 'BasicBlock', 'replace_feature', 'SparseConvBlock', 'SparseBasicBlock', 'SparseConv3dBlock',
-           'SparseBasicBlock3d']
+           'SparseBasicBlock3d', 'checkpointing_report', 'fuse_for_inference', 'apply_sparse_algos',
+           'autotune_sparse_algos']
 
 # %% ../../nbs/04_model_utils.ipynb 3
+import time
+import torch
 import torch.nn as nn
 import spconv
 import spconv.pytorch
 from spconv.core import ConvAlgo
+from spconv.constants import ALL_WEIGHT_IS_KRSC
+from spconv.cppconstants import CPU_ONLY_BUILD
 
 # %% ../../nbs/04_model_utils.ipynb 5
 class Conv(nn.Module):
@@ -97,7 +102,7 @@ class BasicBlock(nn.Module):
         identity = x
         out = self.block1(x)
         out = self.block2(out)
-        out += identity  # Element-wise addition with the input tensor
+        out = out + identity  # Element-wise addition with the input tensor (out-of-place, ReLU needs its output for backward)
         out = self.act(out)  # Apply activation function
 
         return out
@@ -112,6 +117,15 @@ def replace_feature(out, new_features):
         return out
 
 # %% ../../nbs/04_model_utils.ipynb 12
+def _share_indices(conv, # Submanifold convolution
+                   indice_key:str=None # Key shared by the convolutions that reuse one index map, None to build their own
+                   ):
+    "Sets the `indice_key` of `conv`; spconv shares an index map only between layers of the same algorithm, so the key names it too."
+    if indice_key is not None:
+        conv.indice_key = f"{indice_key}_{conv.algo.name.lower()}"
+    return conv
+
+# %% ../../nbs/04_model_utils.ipynb 13
 class SparseConvBlock(spconv.pytorch.SparseModule):
     '''
     Initializes a sparse convolutional block for 2D inputs.
@@ -126,12 +140,13 @@ class SparseConvBlock(spconv.pytorch.SparseModule):
                  kernel_size: int, # Size of the convolving kernel.
                  stride, # Stride of the convolution.
                  use_subm:bool=True, # Whether to use SubMConv2d for stride 1.
-                 bias:bool=False # If True, adds a learnable bias to the output.
+                 bias:bool=False, # If True, adds a learnable bias to the output.
+                 indice_key:str=None # Key of the index map shared with the other SubMConv2d of the stage, for stride 1.
                  ):
         super(SparseConvBlock, self).__init__()
         if stride == 1 and use_subm:
-            self.conv = spconv.pytorch.SubMConv2d(in_channels, out_channels, kernel_size,
-                                                  padding=kernel_size//2, stride=1, bias=bias,)
+            self.conv = _share_indices(spconv.pytorch.SubMConv2d(in_channels, out_channels, kernel_size,
+                                                                 padding=kernel_size//2, stride=1, bias=bias,), indice_key)
         else:
             self.conv = spconv.pytorch.SparseConv2d(in_channels, out_channels, kernel_size,
                                                     padding=kernel_size//2, stride=stride, bias=bias)
@@ -146,7 +161,7 @@ class SparseConvBlock(spconv.pytorch.SparseModule):
 
         return out
 
-# %% ../../nbs/04_model_utils.ipynb 14
+# %% ../../nbs/04_model_utils.ipynb 15
 class SparseBasicBlock(spconv.pytorch.SparseModule):
     '''
     A basic block for sparse convolutional networks, specifically designed for 2D inputs.
@@ -158,12 +173,13 @@ class SparseBasicBlock(spconv.pytorch.SparseModule):
 
     def __init__(self,
                  channels:int, # Number of channels in the input tensor.
-                 kernel_size # Size of the convolving kernel.
+                 kernel_size, # Size of the convolving kernel.
+                 indice_key:str=None # Key of the index map shared with the other blocks of the stage.
                  ):
         super(SparseBasicBlock, self).__init__()
-        self.block1 = SparseConvBlock(channels, channels, kernel_size, 1)
-        self.conv2 = spconv.pytorch.SubMConv2d(channels, channels, kernel_size, padding=kernel_size//2,
-                                               stride=1, bias=False, algo=ConvAlgo.Native, )
+        self.block1 = SparseConvBlock(channels, channels, kernel_size, 1, indice_key=indice_key)
+        self.conv2 = _share_indices(spconv.pytorch.SubMConv2d(channels, channels, kernel_size, padding=kernel_size//2,
+                                                              stride=1, bias=False, algo=ConvAlgo.Native, ), indice_key)
         self.norm2 = nn.BatchNorm1d(channels, eps=1e-3, momentum=0.01)
         self.act2 = nn.ReLU()
 
@@ -177,7 +193,7 @@ class SparseBasicBlock(spconv.pytorch.SparseModule):
 
         return out
 
-# %% ../../nbs/04_model_utils.ipynb 16
+# %% ../../nbs/04_model_utils.ipynb 17
 class SparseConv3dBlock(spconv.pytorch.SparseModule):
     '''
     Initializes a sparse convolutional block for 3D inputs.
@@ -190,12 +206,13 @@ class SparseConv3dBlock(spconv.pytorch.SparseModule):
                 out_channels: int, # Number of channels produced by the convolution.
                 kernel_size, # Size of the convolving kernel.
                 stride, # Stride of the convolution.
-                use_subm:bool=True # Whether to use SubMConv3d for stride 1.
+                use_subm:bool=True, # Whether to use SubMConv3d for stride 1.
+                indice_key:str=None # Key of the index map shared with the other SubMConv3d of the stage, for stride 1.
                 ):
         super(SparseConv3dBlock, self).__init__()
         if stride == 1 and use_subm:
-            self.conv = spconv.pytorch.SubMConv3d(in_channels, out_channels, kernel_size, padding=kernel_size//2,
-                                                  stride=1, bias=False)
+            self.conv = _share_indices(spconv.pytorch.SubMConv3d(in_channels, out_channels, kernel_size, padding=kernel_size//2,
+                                                                 stride=1, bias=False), indice_key)
         else:
             self.conv = spconv.pytorch.SparseConv3d(in_channels, out_channels, kernel_size, padding=kernel_size//2,
                                                     stride=stride, bias=False)
@@ -210,7 +227,7 @@ class SparseConv3dBlock(spconv.pytorch.SparseModule):
 
         return out
 
-# %% ../../nbs/04_model_utils.ipynb 18
+# %% ../../nbs/04_model_utils.ipynb 19
 class SparseBasicBlock3d(spconv.pytorch.SparseModule):
     '''
     A basic block for sparse convolutional networks, specifically designed for 3D inputs.
@@ -221,12 +238,13 @@ class SparseBasicBlock3d(spconv.pytorch.SparseModule):
     '''
     def __init__(self,
                  channels:int, # Number of channels in the input tensor.
-                 kernel_size # Size of the convolving kernel.
+                 kernel_size, # Size of the convolving kernel.
+                 indice_key:str=None # Key of the index map shared with the other blocks of the stage.
                  ):
         super(SparseBasicBlock3d, self).__init__()
-        self.block1 = SparseConv3dBlock(channels, channels, kernel_size, 1)
-        self.conv2 = spconv.pytorch.SubMConv3d(channels, channels, kernel_size, padding=kernel_size//2,
-                                               stride=1, bias=False)
+        self.block1 = SparseConv3dBlock(channels, channels, kernel_size, 1, indice_key=indice_key)
+        self.conv2 = _share_indices(spconv.pytorch.SubMConv3d(channels, channels, kernel_size, padding=kernel_size//2,
+                                                              stride=1, bias=False), indice_key)
         self.norm2 = nn.BatchNorm1d(channels, eps=1e-3, momentum=0.01)
         self.act2 = nn.ReLU()
 
@@ -239,3 +257,222 @@ class SparseBasicBlock3d(spconv.pytorch.SparseModule):
         out = replace_feature(out, self.act2(out.features))
 
         return out
+
+# %% ../../nbs/04_model_utils.ipynb 21
+def checkpointing_report(module:nn.Module, # Module exposing a `checkpointing` attribute, in training mode
+                         inputs:tuple, # Positional arguments of the module's forward
+                         policies:list, # Checkpointing policies to compare
+                         repeats:int=3 # Number of timed forward/backward passes per policy
+                         ): # Dict mapping each policy to its activation memory (MB) and forward/backward time (ms)
+    """
+    Measures, for each checkpointing policy, the memory of the activations kept for backward and the time
+    of a forward/backward pass.
+
+    Kept activations are counted through saved tensor hooks, once per storage, so the numbers are
+    comparable on any device. On CUDA the peak allocated memory during the pass is reported as well.
+    """
+    def _features(out):
+        return out.features if isinstance(out, spconv.pytorch.SparseConvTensor) else out
+
+    report = {}
+    for policy in policies:
+        module.checkpointing = policy
+        saved = {}
+
+        def pack(t):
+            saved[t.untyped_storage().data_ptr()] = t.untyped_storage().nbytes()
+            return t
+
+        with torch.autograd.graph.saved_tensors_hooks(pack, lambda t: t):
+            out = _features(module(*inputs))
+        out.sum().backward()
+        module.zero_grad(set_to_none=True)
+
+        device = out.device
+        if device.type == 'cuda':
+            torch.cuda.synchronize(device)
+            torch.cuda.reset_peak_memory_stats(device)
+            start_memory = torch.cuda.memory_allocated(device)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            _features(module(*inputs)).sum().backward()
+        if device.type == 'cuda':
+            torch.cuda.synchronize(device)
+        elapsed = (time.perf_counter() - start) / repeats
+        module.zero_grad(set_to_none=True)
+
+        report[policy] = {'saved_mb': sum(saved.values()) / 2**20, 'time_ms': elapsed * 1e3}
+        if device.type == 'cuda':
+            report[policy]['peak_mb'] = (torch.cuda.max_memory_allocated(device) - start_memory) / 2**20
+    return report
+
+# %% ../../nbs/04_model_utils.ipynb 22
+def _fold_batchnorm(conv:nn.Module, # Convolution or linear layer whose output only feeds `norm`
+                    norm:nn.Module # Batch normalization layer applied right after `conv`
+                    ):
+    "Folds the scale of `norm` into the weight of `conv` and returns the per-channel shift left to add."
+    scale = torch.rsqrt(norm.running_var + norm.eps)
+    if norm.affine:
+        scale = scale * norm.weight
+    shift = -norm.running_mean * scale
+    if norm.affine:
+        shift = shift + norm.bias
+    if conv.bias is not None:
+        shift = shift + conv.bias * scale
+
+    weight = conv.weight
+    out_dim = 0
+    if isinstance(conv, spconv.pytorch.conv.SparseConvolution):
+        if conv.conv1x1:
+            # spconv runs 1x1 convolutions as a matmul with the weight viewed as (in, out)
+            weight = weight.view(conv.in_channels, conv.out_channels)
+            out_dim = 1
+        elif weight.shape[0] != conv.out_channels:
+            # Native weights kept in the RSKC layout put the output channels next to last
+            out_dim = weight.dim() - 2
+    shape = [1] * weight.dim()
+    shape[out_dim] = -1
+    with torch.no_grad():
+        weight.mul_(scale.view(shape))
+    return shift.detach().clone()
+
+class _ChannelShift(nn.Module):
+    "Adds a per-channel shift to `(N, C)` features, used where the shift can not live in the conv bias."
+    def __init__(self, shift):
+        super(_ChannelShift, self).__init__()
+        self.register_buffer('shift', shift)
+
+    def forward(self, x):
+        return x + self.shift
+
+# %% ../../nbs/04_model_utils.ipynb 23
+def fuse_for_inference(model:nn.Module # Model built from the blocks above, in eval mode and on its inference device
+                       ): # The same model, with every batch normalization folded into the layer before it
+    """
+    Folds each batch normalization layer into the convolution (dense or sparse) or linear layer that
+    precedes it and replaces the normalization with `nn.Identity`, removing one kernel launch and one
+    read/write of the feature map per block at inference time.
+
+    A pair is folded when a `BatchNorm` child is registered right after a convolution or linear child of
+    the same module, which is how `ConvBlock`, `BasicBlock`, the sparse blocks and the `SparseSequential`
+    heads of the backbones are built. The running statistics are used, so the model must be in eval mode
+    and the fused model is only meant for inference. The model is modified in place.
+
+    `spconv` only adds a bias inside its CUDA kernels (and its 1x1 matmul path), so the other sparse
+    convolutions fused on CPU keep the shift as a per-channel add after the convolution; fuse after moving
+    the model to the device it runs on.
+    """
+    assert not model.training, 'fuse_for_inference uses the running statistics, call model.eval() first'
+    folds = (nn.Linear, nn.Conv1d, nn.Conv2d, nn.Conv3d, spconv.pytorch.conv.SparseConvolution)
+    norms = (nn.BatchNorm1d, nn.BatchNorm2d, nn.BatchNorm3d)
+    for module in list(model.modules()):
+        previous = None
+        for name, child in list(module.named_children()):
+            conv = previous.conv if isinstance(previous, Conv) else previous
+            if isinstance(child, norms) and isinstance(conv, folds) and child.track_running_stats:
+                shift = _fold_batchnorm(conv, child)
+                sparse = isinstance(conv, spconv.pytorch.conv.SparseConvolution)
+                if sparse and not conv.conv1x1 and not conv.weight.is_cuda:
+                    setattr(module, name, _ChannelShift(shift))
+                else:
+                    conv.bias = nn.Parameter(shift)
+                    setattr(module, name, nn.Identity())
+            previous = child
+    return model
+
+# %% ../../nbs/04_model_utils.ipynb 26
+def _set_algo(conv, # Sparse convolution
+              algo:ConvAlgo # Algorithm it runs with
+              ):
+    "Sets the algorithm of `conv`, moving it to the index map of its stage built by that algorithm."
+    suffix = f"_{conv.algo.name.lower()}"
+    shared = conv.indice_key is not None and conv.indice_key.endswith(suffix)
+    assert ALL_WEIGHT_IS_KRSC or (conv.algo == ConvAlgo.Native) == (algo == ConvAlgo.Native), \
+        "The weights of the native algorithm have another layout in this spconv build"
+    indice_key = conv.indice_key[:-len(suffix)] if shared else None
+    conv.algo = algo
+    _share_indices(conv, indice_key)
+
+# %% ../../nbs/04_model_utils.ipynb 27
+def apply_sparse_algos(model:nn.Module, # Model built from the sparse blocks above
+                       config:dict # Algorithm name of each sparse convolution, by module name, as returned by `autotune_sparse_algos`
+                       ): # The same model, patched in place
+    "Sets the spconv algorithm of the sparse convolutions named in `config`, e.g. a config tuned on the deployment target."
+    modules = dict(model.named_modules())
+    for name, algo in config.items():
+        assert name in modules and isinstance(modules[name], spconv.pytorch.conv.SparseConvolution), f"No sparse convolution {name}"
+        assert not CPU_ONLY_BUILD or algo == ConvAlgo.Native.name, "A CPU-only spconv build only runs the native algorithm"
+        _set_algo(modules[name], ConvAlgo[algo])
+    return model
+
+# %% ../../nbs/04_model_utils.ipynb 28
+def autotune_sparse_algos(model:nn.Module, # Model built from the sparse blocks above, on its device
+                          inputs:tuple, # Positional arguments of the model's forward, a representative sample
+                          algos:list=None, # Algorithms to compare, every algorithm the build and the device run by default
+                          repeats:int=5 # Number of timed forward passes per algorithm
+                          ): # Config mapping each sparse convolution to its fastest algorithm, and the times (ms) of each
+    """
+    Times every sparse convolution of `model` with each spconv algorithm and picks the fastest one per layer.
+
+    The convolutions that share an index map (the same `indice_key` for one stage) are tuned together, on the sum
+    of their times, so that the map is still built once. The model is left with its algorithms unchanged; pass the
+    config to `apply_sparse_algos` to use it.
+    """
+    device = next(model.parameters()).device
+    if algos is None:
+        algos = [ConvAlgo.Native] if CPU_ONLY_BUILD or device.type != 'cuda' else list(ConvAlgo)
+    # 1x1 convolutions run as a matmul whatever the algorithm
+    convs = {name: module for name, module in model.named_modules()
+             if isinstance(module, spconv.pytorch.conv.SparseConvolution) and not module.conv1x1}
+    original = {name: conv.algo.name for name, conv in convs.items()}
+    groups = {}
+    for name, conv in convs.items():
+        suffix = f"_{conv.algo.name.lower()}"
+        shared = conv.indice_key is not None and conv.indice_key.endswith(suffix)
+        groups.setdefault(conv.indice_key[:-len(suffix)] if shared else name, []).append(name)
+
+    def sync():
+        if device.type == 'cuda':
+            torch.cuda.synchronize(device)
+
+    starts, elapsed = {}, {name: [] for name in convs}
+    def before(name):
+        def hook(module, args):
+            sync()
+            starts[name] = time.perf_counter()
+        return hook
+    def after(name):
+        def hook(module, args, out):
+            sync()
+            elapsed[name].append(time.perf_counter() - starts[name])
+        return hook
+
+    handles = [handle for name, conv in convs.items()
+               for handle in (conv.register_forward_pre_hook(before(name)), conv.register_forward_hook(after(name)))]
+    times = {name: {} for name in convs}
+    try:
+        with torch.no_grad():
+            for algo in algos:
+                apply_sparse_algos(model, {name: algo.name for name in convs})
+                try:
+                    model(*inputs)  # Warm-up: kernel selection and caches of the algorithm
+                except Exception:  # e.g. a kernel size or dtype the algorithm does not support, skipped
+                    continue
+                for name in convs:
+                    elapsed[name].clear()
+                for _ in range(repeats):
+                    model(*inputs)
+                for name in convs:
+                    times[name][algo.name] = torch.tensor(elapsed[name]).median().item() * 1e3
+    finally:
+        for handle in handles:
+            handle.remove()
+        apply_sparse_algos(model, original)
+
+    config = {}
+    for names in groups.values():
+        tuned = set.intersection(*(set(times[name]) for name in names))
+        if tuned:
+            best = min(tuned, key=lambda algo: sum(times[name][algo] for name in names))
+            config.update({name: best for name in names})
+    return config, times